@@ -6,16 +6,49 @@ Student Achievement Management Panel
 """
 import os
 import io
+import csv
 import math
+import time
+import hashlib
 import logging
+import logging.handlers
+import queue
+import atexit
+import tempfile
+import warnings
+from collections import defaultdict
+from functools import lru_cache
 from datetime import datetime
-from flask import Flask, redirect, render_template, request, session, url_for, send_file, flash
-from sqlalchemy import delete, select, func
+from itertools import groupby
+from flask import Flask, make_response, redirect, render_template, request, session, url_for, send_file, flash
+from flask_caching import Cache
+from jinja2 import FileSystemBytecodeCache
+from sqlalchemy import delete, insert, select, func
 from sqlalchemy.orm import selectinload
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment, NamedStyle
+from openpyxl.utils import get_column_letter
 import json
 
+# orjson (если установлен) ускоряет горячие JSON-пути в разы;
+# без него работаем на стандартной библиотеке
+try:
+    import orjson
+
+    def _json_loads(s):
+        return orjson.loads(s)
+
+    def _json_dumps(obj):
+        # orjson не экранирует не-ASCII по умолчанию — как ensure_ascii=False
+        return orjson.dumps(obj).decode()
+except ImportError:
+    def _json_loads(s):
+        return json.loads(s)
+
+    def _json_dumps(obj):
+        return json.dumps(obj, ensure_ascii=False)
+
 # Загрузка переменных окружения из .env файла
 # Это происходит ДО импорта других модулей, чтобы переменные были доступны везде
 try:
@@ -39,8 +72,8 @@ from database import (
     AdminUserModel,
     Grade,
     SchoolClass,
-    get_admin_user,
     get_db_session,
+    ScopedSession,
     init_db,
     search_students,
     authenticate_admin,
@@ -62,6 +95,383 @@ from database import (
     update_school_class,
 )
 
+# Кэш приложения (SimpleCache — в памяти процесса)
+cache = Cache(config={"CACHE_TYPE": "SimpleCache"})
+
+# Статистический запрос без параметров: три счетчика одним SELECT.
+# Готовая SQL-строка уходит через exec_driver_sql, минуя компиляцию Core
+_DASHBOARD_STATS_SQL = (
+    "SELECT "
+    "(SELECT COUNT(*) FROM students), "
+    "(SELECT COUNT(*) FROM school_classes), "
+    "(SELECT COUNT(*) FROM admin_users WHERE is_active = 1)"
+)
+
+
+# Справочники и стили экспорта Excel: создаются один раз на процесс,
+# а не на каждый вызов экспорта
+LEVEL_MAP = {'school': 'Школьный', 'district': 'Районный', 'region': 'Региональный', 'russia': 'Всероссийский', 'world': 'Международный'}
+RESULT_MAP = {'participant': 'Участник', 'prize': 'Призёр', 'winner': 'Победитель'}
+HEADER_STYLE = NamedStyle(
+    name="header",
+    font=Font(bold=True),
+    fill=PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid"),
+    alignment=Alignment(horizontal="center"),
+)
+EXPORT_HEADERS = ["ID", "ФИО", "Класс", "Кл. руководитель", "Название конкурса", "Уровень", "Результат", "Год", "Дата участия", "Дата создания"]
+
+
+# Узкая Core-выборка для экспортов: только нужные колонки, кортежи
+# вместо ORM-объектов, сортировка по имени класса сразу в SQL
+_EXPORT_ROWS_STMT = (
+    select(
+        Student.id,
+        Student.full_name,
+        SchoolClass.class_name,
+        func.coalesce(AdminUserModel.username, "").label("class_teacher"),
+        Student.achievements,
+        Student.created_at,
+    )
+    .join(SchoolClass, SchoolClass.id == Student.school_class_id)
+    .join(AdminUserModel, AdminUserModel.id == SchoolClass.class_teacher_id, isouter=True)
+    .order_by(SchoolClass.class_name.asc(), Student.full_name.asc())
+)
+
+
+def _send_workbook(wb, filename, etag=None):
+    """Сохраняет книгу во временный файл и отдает его send_file.
+
+    Файл стримится с диска (wsgi.file_wrapper / sendfile), а не держится
+    целиком в BytesIO; временный файл удаляется после отдачи ответа.
+    """
+    tmp = tempfile.NamedTemporaryFile(suffix=".xlsx", delete=False)
+    tmp_path = tmp.name
+    tmp.close()
+    wb.save(tmp_path)
+
+    response = send_file(
+        tmp_path,
+        as_attachment=True,
+        download_name=filename,
+        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    )
+    if etag is not None:
+        response.set_etag(etag)
+
+    @response.call_on_close
+    def _cleanup():
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+    return response
+
+
+def _new_sheet_buffer(headers):
+    """Буфер строк листа: копит строки и ширины колонок одним проходом."""
+    data_rows = []
+    col_widths = [len(h) for h in headers]
+
+    def add_row(row_values):
+        for i, v in enumerate(row_values):
+            length = len(v) if isinstance(v, str) else len(str(v))
+            if length > col_widths[i]:
+                col_widths[i] = length
+        data_rows.append(row_values)
+
+    return data_rows, col_widths, add_row
+
+
+def _append_student_rows(add_row, student, created_str,
+                         lvl=LEVEL_MAP.get, res=RESULT_MAP.get):
+    """Разворачивает достижения ученика в 10-колоночные строки экспорта.
+
+    Одна специализированная функция вместо дублирования ветвления в
+    каждом экспорте; ссылки на .get связаны в значениях по умолчанию.
+    """
+    raw = student.achievements
+    parsed = _parse_achievements_cached(raw) if raw else []
+    if parsed and "title" in parsed[0]:
+        for ach in parsed:
+            add_row((
+                student.id,
+                student.full_name,
+                student.class_name,
+                student.class_teacher,
+                ach.get("title", ""),
+                lvl(ach.get("level", ""), ach.get("level", "")),
+                res(ach.get("result", ""), ach.get("result", "")),
+                ach.get("year", ""),
+                ach.get("date", ""),
+                created_str,
+            ))
+    else:
+        add_row((
+            student.id,
+            student.full_name,
+            student.class_name,
+            student.class_teacher,
+            student.achievements or "",
+            "", "", "", "",
+            created_str,
+        ))
+
+
+# Безпараметрные выражения, повторяющиеся из запроса в запрос, собираем
+# один раз на уровне модуля — на каждый вызов остается только выполнение
+_GRADES_TREE_STMT = (
+    select(Grade)
+    .options(selectinload(Grade.classes).selectinload(SchoolClass.class_teacher))
+    .order_by(Grade.grade_number)
+)
+
+_CLASS_COUNTS_STMT = (
+    select(Student.school_class_id, func.count())
+    .group_by(Student.school_class_id)
+)
+
+# Превью панели: первые три ученика каждого класса через ROW_NUMBER
+_preview_rn = func.row_number().over(
+    partition_by=Student.school_class_id,
+    order_by=Student.full_name,
+).label("rn")
+_preview_subq = select(
+    Student.school_class_id, Student.full_name, Student.achievements_count, _preview_rn
+).subquery()
+_PREVIEW_STMT = (
+    select(_preview_subq.c.school_class_id, _preview_subq.c.full_name, _preview_subq.c.achievements_count)
+    .where(_preview_subq.c.rn <= 3)
+    .order_by(_preview_subq.c.school_class_id, _preview_subq.c.rn)
+)
+
+# Плоская выборка параллелей с классами для форм (см. _grades_with_classes)
+_GRADES_FLAT_STMT = (
+    select(
+        Grade.id,
+        Grade.grade_name,
+        Grade.grade_number,
+        SchoolClass.id,
+        SchoolClass.class_name,
+        AdminUserModel.username,
+    )
+    .join(SchoolClass, SchoolClass.grade_id == Grade.id, isouter=True)
+    .join(AdminUserModel, AdminUserModel.id == SchoolClass.class_teacher_id, isouter=True)
+    .order_by(Grade.grade_number, SchoolClass.class_name)
+)
+
+
+@cache.memoize(timeout=60)
+def _dashboard_stats():
+    """Статистика для админ-панели. Меняется редко, поэтому кэшируем на минуту."""
+    with next(get_db_session()) as db:
+        total_students, total_classes, active_users = (
+            db.connection().exec_driver_sql(_DASHBOARD_STATS_SQL).one()
+        )
+    return total_students or 0, total_classes or 0, active_users or 0
+
+
+# Защита входа от перебора: окно попыток на IP в памяти процесса
+# (как и SimpleCache). bcrypt дорог по замыслу — лимит не дает превратить
+# его стоимость в вектор DoS
+_LOGIN_ATTEMPTS = {}
+_LOGIN_MAX_ATTEMPTS = 5
+_LOGIN_WINDOW_SECONDS = 60
+
+
+def _login_throttled(ip):
+    """True, если с этого IP исчерпан лимит неудачных попыток за окно.
+
+    Только проверка, без инкремента: успешные входы не должны
+    расходовать лимит (за одним NAT сидит много пользователей).
+    Счетчик двигает _register_login_failure после провала bcrypt.
+    """
+    now = time.monotonic()
+    window_start, attempts = _LOGIN_ATTEMPTS.get(ip, (now, 0))
+    if now - window_start > _LOGIN_WINDOW_SECONDS:
+        return False
+    return attempts >= _LOGIN_MAX_ATTEMPTS
+
+
+def _register_login_failure(ip):
+    """Засчитывает неудачную попытку входа с этого IP."""
+    now = time.monotonic()
+    window_start, attempts = _LOGIN_ATTEMPTS.get(ip, (now, 0))
+    if now - window_start > _LOGIN_WINDOW_SECONDS:
+        window_start, attempts = now, 0
+    _LOGIN_ATTEMPTS[ip] = (window_start, attempts + 1)
+
+    # Не даем словарю расти бесконечно: чистим устаревшие окна
+    if len(_LOGIN_ATTEMPTS) > 1024:
+        cutoff = now - _LOGIN_WINDOW_SECONDS
+        for key in [k for k, (ts, _) in _LOGIN_ATTEMPTS.items() if ts < cutoff]:
+            del _LOGIN_ATTEMPTS[key]
+
+
+def _export_etag(db, extra=""):
+    """ETag для экспортов: меняется при добавлении, удалении и правке.
+
+    Сигнатура считается одним дешевым запросом; сборка книги запускается
+    только если клиентская копия устарела. max(updated_at) ловит правки
+    существующих учеников, которые не двигают ни count, ни created_at.
+    Классы и пользователи входят в сигнатуру тоже: смена руководителя
+    или его имени меняет колонки экспорта, не трогая таблицу учеников.
+    Count нужен рядом с max(updated_at), потому что удаление строки
+    максимум не двигает.
+    """
+    (
+        max_created, max_updated, students_count,
+        classes_updated, classes_count, users_updated, users_count,
+    ) = db.execute(
+        select(
+            func.max(Student.created_at),
+            func.max(Student.updated_at),
+            func.count(),
+            select(func.max(SchoolClass.updated_at)).scalar_subquery(),
+            select(func.count()).select_from(SchoolClass).scalar_subquery(),
+            select(func.max(AdminUserModel.updated_at)).scalar_subquery(),
+            select(func.count()).select_from(AdminUserModel).scalar_subquery(),
+        ).select_from(Student)
+    ).one()
+    signature = (
+        f"{max_created}-{max_updated}-{students_count}"
+        f"-{classes_updated}-{classes_count}-{users_updated}-{users_count}"
+        f"-{request.path}-{extra}"
+    )
+    return hashlib.md5(signature.encode()).hexdigest()
+
+
+@lru_cache(maxsize=4096)
+def _parse_achievements_cached(raw):
+    """Разбор JSON достижений с кэшем по самой строке.
+
+    Ключом служит сам текст: одинаковая строка дает одинаковый
+    результат, так что инвалидация не нужна. Результат общий —
+    вызывающие его только читают.
+    """
+    # Старые записи хранят достижения плоским текстом: это не JSON-список,
+    # выходим сразу, не оплачивая исключение парсера
+    if not raw.lstrip().startswith("["):
+        return []
+    try:
+        val = _json_loads(raw)
+    except ValueError:
+        # JSONDecodeError и у json, и у orjson — подкласс ValueError
+        return []
+    return val if isinstance(val, list) else []
+
+
+@lru_cache(maxsize=4096)
+def _fmt_created(dt):
+    """Дата создания для строк экспорта (до минут).
+
+    isoformat заметно дешевле strftime, а кэш схлопывает повторы —
+    дат создания на порядок меньше, чем строк.
+    """
+    return dt.isoformat(sep=" ", timespec="minutes") if dt else ""
+
+
+@lru_cache(maxsize=4096)
+def _fmt_created_date(dt):
+    """Дата создания без времени (для отчета класса)."""
+    return dt.date().isoformat() if dt else ""
+
+
+def safe_from_json(s):
+    """Безопасный разбор JSON со списком достижений (фильтр from_json)."""
+    if not s:
+        return []
+    return _parse_achievements_cached(s)
+
+
+def _grades_with_classes(db):
+    """Параллели с классами для выпадающих списков форм.
+
+    Один плоский JOIN вместо selectinload-каскада: независимо от числа
+    параллелей выполняется ровно один запрос, группировка — по
+    отсортированным строкам без промежуточных ORM-объектов.
+    """
+    rows = db.execute(_GRADES_FLAT_STMT).all()
+
+    grades = []
+    for (grade_id, grade_name, grade_number), group in groupby(rows, key=lambda r: (r[0], r[1], r[2])):
+        grades.append({
+            'id': grade_id,
+            'grade_name': grade_name,
+            'grade_number': grade_number,
+            'classes': [
+                {
+                    'id': class_id,
+                    'class_name': class_name,
+                    'class_teacher': {'username': teacher_name} if teacher_name else None,
+                }
+                for _, _, _, class_id, class_name, teacher_name in group
+                if class_id is not None
+            ],
+        })
+    return grades
+
+
+@cache.memoize(timeout=60)
+def _is_class_teacher_of(user_id, class_id):
+    """Закреплен ли класс за пользователем.
+
+    Назначение классного руководителя меняется редко, поэтому результат
+    кэшируется на минуту — повторные проверки прав не ходят в БД.
+    """
+    with next(get_db_session()) as db:
+        school_class = db.get(SchoolClass, class_id)
+        return bool(school_class and school_class.class_teacher_id == user_id)
+
+
+def _parse_student_form():
+    """Разбор формы ученика одним проходом.
+
+    Возвращает (full_name, school_class_id, achievements): обязательные поля
+    уже обрезаны, достижения собраны без повторных обращений к request.form.
+    """
+    full_name = (request.form.get("full_name") or "").strip()
+    school_class_id = (request.form.get("school_class_id") or "").strip()
+
+    getlist = request.form.getlist
+    achievements = [
+        {
+            "title": title.strip(),
+            "level": level,
+            "result": result,
+            "year": year,
+            "date": date,
+        }
+        for title, level, result, year, date in zip(
+            getlist("ach_title[]"),
+            getlist("ach_level[]"),
+            getlist("ach_result[]"),
+            getlist("ach_year[]"),
+            getlist("ach_date[]"),
+        )
+        if title.strip() and level and result and year and date
+    ]
+    return full_name, school_class_id, achievements
+
+
+@cache.memoize(timeout=30)
+def _get_student_snapshot(student_id):
+    """Снимок карточки ученика для формы редактирования.
+
+    Повторные открытия формы одним и тем же админом не ходят в БД;
+    кэш сбрасывается в POST-ветке после сохранения изменений.
+    """
+    with next(get_db_session()) as db:
+        student = db.get(Student, student_id)
+        if not student:
+            return None
+        return {
+            'id': student.id,
+            'full_name': student.full_name,
+            'school_class_id': student.school_class_id,
+            'achievements': student.achievements,
+        }
+
 
 def create_app():
     """
@@ -71,6 +481,36 @@ def create_app():
     # Создаем приложение Flask
     app = Flask(__name__)
 
+    # Инициализируем кэш
+    cache.init_app(app)
+
+    # Сессии БД потоко-локальные (см. ScopedSession): по завершении
+    # запроса убираем сессию из реестра, чтобы поток воркера не держал
+    # состояние между запросами
+    @app.teardown_appcontext
+    def _remove_db_session(exc):
+        ScopedSession.remove()
+
+    # Кэш байткода Jinja-шаблонов: первый рендер после перезапуска
+    # не компилирует шаблоны заново, а берет их с диска
+    try:
+        jinja_cache_dir = os.environ.get(
+            "JINJA_CACHE_DIR",
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), ".jinja_cache"),
+        )
+        os.makedirs(jinja_cache_dir, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory=jinja_cache_dir)
+    except OSError as e:
+        # Нет прав на директорию кэша — работаем без кэша байткода
+        app.logger.warning(f"Кэш шаблонов Jinja недоступен: {e}")
+
+    # Вне режима отладки шаблоны не меняются на лету: отключаем проверку
+    # mtime при каждом рендере и расширяем кэш скомпилированных шаблонов
+    if os.environ.get("FLASK_DEBUG", "True").lower() != "true":
+        app.config["TEMPLATES_AUTO_RELOAD"] = False
+        app.jinja_env.auto_reload = False
+        app.jinja_env.cache_size = 400
+
     # Настраиваем логирование
     app.logger.setLevel(logging.DEBUG)
     app.logger.info("Создание Flask приложения...")
@@ -79,7 +519,6 @@ def create_app():
     # Если не установлен, генерируем предупреждение
     secret_key = os.environ.get("FLASK_SECRET_KEY")
     if not secret_key:
-        import warnings
         warnings.warn(
             "FLASK_SECRET_KEY не установлен! Используется небезопасный ключ по умолчанию. "
             "Установите FLASK_SECRET_KEY в .env файле для продакшена.",
@@ -88,83 +527,179 @@ def create_app():
         secret_key = "dev-secret-key-change-in-production"
     app.config["SECRET_KEY"] = secret_key
 
-    # Создаем таблицы (если их еще нет)
-    init_db()
+    # Сессия — клиентская подписанная кука с минимальным payload
+    # (несколько admin_* ключей): серверный бэкенд добавил бы I/O на каждый
+    # запрос, не убирая подпись. Ограничиваем куку настройками безопасности
+    app.config["SESSION_COOKIE_HTTPONLY"] = True
+    app.config["SESSION_COOKIE_SAMESITE"] = "Lax"
+    app.config["SESSION_COOKIE_SECURE"] = (
+        os.environ.get("SESSION_COOKIE_SECURE", "False").lower() == "true"
+    )
+
+    # Серверное хранилище сессий — опционально, включается переменной
+    # SESSION_TYPE (filesystem/redis) при установленном пакете flask-session:
+    # в куке остается только id, подпись payload на каждый ответ уходит
+    session_type = os.environ.get("SESSION_TYPE")
+    if session_type:
+        try:
+            from flask_session import Session
+            app.config["SESSION_TYPE"] = session_type
+            if session_type == "redis":
+                import redis
+                app.config["SESSION_REDIS"] = redis.Redis.from_url(
+                    os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+                )
+            Session(app)
+        except ImportError:
+            # flask-session не установлен, остаемся на клиентской куке
+            app.logger.warning(
+                "SESSION_TYPE задан, но пакет flask-session не установлен — "
+                "используется подписанная кука"
+            )
+
+    # Создаем таблицы (если их еще нет) и дефолтного админа.
+    # При нескольких воркерах достаточно одного запуска flask init-db
+    # на деплое с AUTO_INIT_DB=0 — тогда воркеры стартуют без проверок схемы
+    if os.environ.get("AUTO_INIT_DB", "1") == "1":
+        init_db()
+        create_default_admin()
 
-    # Создаем дефолтного админа, если его нет
-    create_default_admin()
+    @app.cli.command("init-db")
+    def init_db_command():
+        """Одноразовая инициализация БД: схема, индексы, дефолтный админ."""
+        init_db()
+        create_default_admin()
+        print("База данных инициализирована")
 
     # JSON to object filter for jinja templates
-    def safe_from_json(s):
-        import json
-        try:
-            val = json.loads(s or '[]')
-            if isinstance(val, list):
-                return val
-            return []
-        except Exception:
-            return []
     app.jinja_env.filters['from_json'] = safe_from_json
 
-    # Главная: список карточек учеников (публичный просмотр)
+    # Главная: список карточек учеников (публичный просмотр).
+    # Ответ кэшируется целиком на минуту (ключ включает строку запроса),
+    # поэтому анонимный трафик в типичном случае не трогает ни БД, ни Jinja
     @app.route("/", methods=["GET"])
+    @cache.cached(timeout=60, query_string=True,
+                  response_filter=lambda resp: getattr(resp, "status_code", 200) == 200)
     def index():
         q = request.args.get("q")
         class_name = request.args.get("class")
+        page = max(request.args.get("page", 1, type=int) or 1, 1)
+        per_page = min(max(request.args.get("per_page", 50, type=int) or 50, 1), 200)
 
         with next(get_db_session()) as db:
-            # Загружаем учеников с классами и учителями заранее
+            # ETag по сигнатуре данных: даты последнего добавления и правки,
+            # число учеников, классов и пользователей (карточки показывают
+            # названия классов и имена руководителей, так что их правки
+            # тоже должны менять ETag). max(updated_at) ловит
+            # редактирования, не меняющие count/created_at. При совпадении
+            # If-None-Match отвечаем 304 без выборки и рендера
+            (
+                max_created, max_updated, students_count,
+                classes_updated, classes_count, users_updated, users_count,
+            ) = db.execute(
+                select(
+                    func.max(Student.created_at),
+                    func.max(Student.updated_at),
+                    func.count(),
+                    select(func.max(SchoolClass.updated_at)).scalar_subquery(),
+                    select(func.count()).select_from(SchoolClass).scalar_subquery(),
+                    select(func.max(AdminUserModel.updated_at)).scalar_subquery(),
+                    select(func.count()).select_from(AdminUserModel).scalar_subquery(),
+                ).select_from(Student)
+            ).one()
+            etag = hashlib.md5(
+                f"{max_created}-{max_updated}-{students_count}-"
+                f"{classes_updated}-{classes_count}-{users_updated}-{users_count}-"
+                f"{q}-{class_name}-{page}-{per_page}".encode()
+            ).hexdigest()
+            if request.if_none_match.contains(etag):
+                response = make_response("", 304)
+                response.set_etag(etag)
+                return response
+
+            # Фильтры и пагинация выполняются в SQL: загружаем только
+            # нужную страницу, а не всю таблицу учеников
+            stmt = select(Student).join(SchoolClass)
+            count_stmt = select(func.count()).select_from(Student).join(SchoolClass)
+            if q:
+                name_filter = Student.full_name.ilike(f"%{q.strip()}%")
+                stmt = stmt.where(name_filter)
+                count_stmt = count_stmt.where(name_filter)
+            if class_name:
+                stmt = stmt.where(SchoolClass.class_name == class_name)
+                count_stmt = count_stmt.where(SchoolClass.class_name == class_name)
+
+            total_students = db.execute(count_stmt).scalar() or 0
+
             students_query = db.execute(
-                select(Student).options(
+                stmt.options(
                     selectinload(Student.school_class).selectinload(SchoolClass.class_teacher)
-                ).order_by(Student.school_class_id, Student.full_name)
+                ).order_by(SchoolClass.class_name.asc(), Student.full_name.asc())
+                .limit(per_page)
+                .offset((page - 1) * per_page)
             ).scalars().all()
 
-            # Применяем фильтры если заданы и группируем по классам
-            classes_data = {}
-            for student in students_query:
-                # Применяем фильтры
-                if q and q.lower() not in student.full_name.lower():
-                    continue
-                if class_name and class_name != student.class_name:
-                    continue
-
-                # Группируем по классам
-                class_key = student.class_name
-                if class_key not in classes_data:
-                    classes_data[class_key] = {
-                        'class_name': class_key,
-                        'class_teacher': student.class_teacher,
-                        'students': []
-                    }
-                classes_data[class_key]['students'].append(student)
-
-            # Преобразуем в список и сортируем по названию класса
-            classes_list = list(classes_data.values())
-            classes_list.sort(key=lambda x: x['class_name'])
+            # Строки уже отсортированы по классу — группируем одним проходом
+            # без промежуточного словаря
+            classes_list = []
+            for class_key, group in groupby(students_query, key=lambda s: s.class_name):
+                class_students = list(group)
+                classes_list.append({
+                    'class_name': class_key,
+                    'class_teacher': class_students[0].class_teacher,
+                    'students': class_students,
+                })
 
-        return render_template("index.html", classes=classes_list, q=q or "", class_name=class_name or "")
+        total_pages = max((total_students + per_page - 1) // per_page, 1)
+        response = make_response(render_template(
+            "index.html",
+            classes=classes_list,
+            q=q or "",
+            class_name=class_name or "",
+            page=page,
+            per_page=per_page,
+            total_pages=total_pages,
+        ))
+        # Браузеры и обратные прокси могут отдавать страницу из кэша минуту,
+        # дальше — условные запросы по ETag
+        response.set_etag(etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = 60
+        return response
 
     # Страница входа для админа
     @app.route("/admin/login", methods=["GET", "POST"])
     def admin_login():
         if request.method == "POST":
+            # Лимит попыток проверяем до bcrypt: перебор не жжет CPU
+            if _login_throttled(request.remote_addr or ""):
+                app.logger.warning(f"Превышен лимит попыток входа с {request.remote_addr}")
+                return render_template(
+                    "admin_login.html",
+                    error_message="Слишком много попыток входа. Попробуйте через минуту."
+                ), 429
+
             username = request.form.get("username", "").strip()
             password = request.form.get("password", "").strip()
 
             app.logger.info(f"Попытка входа: пользователь '{username}'")
 
-            # Аутентифицируем через новую систему
-            admin = authenticate_admin(username, password)
+            # Аутентифицируем через новую систему, переиспользуя
+            # потоко-локальную сессию запроса вместо отдельного чекаута
+            admin = authenticate_admin(username, password, db=ScopedSession())
 
             if admin:
                 app.logger.info(f"Успешный вход: {admin.username} (роль: {admin.role})")
+                # Успешный вход обнуляет счетчик неудач этого IP
+                _LOGIN_ATTEMPTS.pop(request.remote_addr or "", None)
                 session["admin_authenticated"] = True
+                session["admin_id"] = admin.id
                 session["admin_username"] = admin.username
                 session["admin_role"] = admin.role
                 return redirect(url_for("admin_dashboard"))
 
             # Если данные неверные — показываем ошибку
+            _register_login_failure(request.remote_addr or "")
             app.logger.warning(f"Неудачная попытка входа: {username}")
             return render_template("admin_login.html", error_message="Неверные учетные данные")
 
@@ -211,11 +746,9 @@ def create_app():
             return True
 
         # Классный руководитель может экспортировать только свой класс
+        # (проверка кэшируется, см. _is_class_teacher_of)
         if user_role == "class_teacher" and class_id:
-            with next(get_db_session()) as db:
-                school_class = db.get(SchoolClass, class_id)
-                if school_class and school_class.class_teacher_id == user_id:
-                    return True
+            return _is_class_teacher_of(user_id, class_id)
 
         return False
 
@@ -242,13 +775,22 @@ def create_app():
 
         app.logger.debug("Загрузка данных админ-панели")
         with next(get_db_session()) as db:
-            # Получаем все параллели с классами и учениками
-            grades_query = db.execute(
-                select(Grade).options(
-                    selectinload(Grade.classes).selectinload(SchoolClass.students),
-                    selectinload(Grade.classes).selectinload(SchoolClass.class_teacher)
-                ).order_by(Grade.grade_number)
-            ).scalars().all()
+            # Параллели и классы без коллекций учеников: счетчики и превью
+            # считаются агрегатами в SQL, а не загрузкой всех строк в Python
+            grades_query = db.execute(_GRADES_TREE_STMT).scalars().all()
+
+            # Число учеников по классам — один GROUP BY на всю панель
+            students_counts = dict(db.execute(_CLASS_COUNTS_STMT).all())
+
+            # Превью: первые три ученика каждого класса одним оконным запросом
+            preview_rows = db.execute(_PREVIEW_STMT).all()
+            previews = defaultdict(list)
+            for school_class_id, full_name, achievements_count in preview_rows:
+                previews[school_class_id].append({
+                    'full_name': full_name,
+                    # Денормализованный счетчик — без разбора JSON с достижениями
+                    'achievements_count': achievements_count or 0
+                })
 
             # Преобразуем в обычные структуры данных для шаблона
             grades = []
@@ -262,34 +804,32 @@ def create_app():
 
                 total_students_in_grade = 0
                 for school_class in grade.classes:
+                    students_count = students_counts.get(school_class.id, 0)
                     class_data = {
                         'id': school_class.id,
                         'class_name': school_class.class_name,
-                        'students': len(school_class.students),
+                        'students': students_count,
                         'class_teacher': {
                             'username': school_class.class_teacher.username if school_class.class_teacher else None,
                             'role': school_class.class_teacher.role if school_class.class_teacher else None
                         } if school_class.class_teacher else None,
-                        'recent_students': [
-                            {
-                                'full_name': student.full_name,
-                                'achievements_count': len(student.achievements.split(',')) if student.achievements else 0
-                            } for student in school_class.students[:3]
-                        ] if school_class.students else []
+                        'recent_students': previews.get(school_class.id, [])
                     }
                     grade_data['classes'].append(class_data)
-                    total_students_in_grade += len(school_class.students)
+                    total_students_in_grade += students_count
 
                 grade_data['total_students'] = total_students_in_grade
                 grade_data['classes_count'] = len(grade_data['classes'])
                 grades.append(grade_data)
 
-            # Статистика
-            total_students = db.execute(select(func.count()).select_from(Student)).scalar() or 0
-            total_classes = db.execute(select(func.count()).select_from(SchoolClass)).scalar() or 0
-            active_users = db.execute(
-                select(func.count()).select_from(AdminUserModel).where(AdminUserModel.is_active == "1")
-            ).scalar() or 0
+        # При частичном обновлении (?partial=1) карточки статистики
+        # не перерисовываются — не ходим за счетчиками вовсе
+        partial = bool(request.args.get("partial"))
+        if partial:
+            total_students = total_classes = active_users = 0
+        else:
+            # Статистика (кэшируется, см. _dashboard_stats)
+            total_students, total_classes, active_users = _dashboard_stats()
 
         # Рендерим шаблон и передаем данные
         return render_template(
@@ -299,6 +839,7 @@ def create_app():
             total_classes=total_classes,
             active_users=active_users,
             user_roles=USER_ROLES,
+            partial=partial,
         )
 
     # Управление параллелями (админ)
@@ -327,6 +868,7 @@ def create_app():
                                 grade = Grade(grade_number=grade_number)
                                 db.add(grade)
                                 db.commit()
+                                cache.clear()
                                 flash(f"Параллель {grade_number} классов создана!", "success")
 
                         except Exception as e:
@@ -351,6 +893,7 @@ def create_app():
                                 else:
                                     db.delete(grade)
                                     db.commit()
+                                    cache.clear()
                                     flash("Параллель удалена!", "success")
                             else:
                                 flash("Параллель не найдена!", "error")
@@ -395,32 +938,9 @@ def create_app():
         if auth_result != True:
             return auth_result
 
-        with next(get_db_session()) as db:
-            # Загружаем параллели с классами и учителями
-            grades_query = db.execute(
-                select(Grade).options(
-                    selectinload(Grade.classes).selectinload(SchoolClass.class_teacher)
-                ).order_by(Grade.grade_number)
-            ).scalars().all()
-
-            # Преобразуем в обычные структуры данных для шаблона
-            grades = []
-            for grade in grades_query:
-                grade_data = {
-                    'id': grade.id,
-                    'grade_name': grade.grade_name,
-                    'grade_number': grade.grade_number,
-                    'classes': [
-                        {
-                            'id': school_class.id,
-                            'class_name': school_class.class_name,
-                            'class_teacher': {
-                                'username': school_class.class_teacher.username if school_class.class_teacher else None
-                            } if school_class.class_teacher else None
-                        } for school_class in grade.classes
-                    ]
-                }
-                grades.append(grade_data)
+        def _form_context(db):
+            """Параллели с классами и выбранный класс для формы."""
+            grades = _grades_with_classes(db)
 
             selected_class = None
             if class_id:
@@ -433,59 +953,54 @@ def create_app():
                         'class_name': selected_class_query.class_name
                     }
 
-        if request.method == "POST":
-            full_name = request.form.get("full_name", "").strip()
-            school_class_id = request.form.get("school_class_id")
-
-            ach_titles = request.form.getlist("ach_title[]")
-            ach_levels = request.form.getlist("ach_level[]")
-            ach_results = request.form.getlist("ach_result[]")
-            ach_years = request.form.getlist("ach_year[]")
-            ach_dates = request.form.getlist("ach_date[]")
-            achievements = []
-            for i in range(len(ach_titles)):
-                if not (ach_titles[i].strip() and ach_levels[i] and ach_results[i] and ach_years[i] and ach_dates[i]):
-                    continue
-                achievements.append({
-                    "title": ach_titles[i].strip(),
-                    "level": ach_levels[i],
-                    "result": ach_results[i],
-                    "year": ach_years[i],
-                    "date": ach_dates[i],
-                })
-            achievements_json = json.dumps(achievements, ensure_ascii=False)
+            return grades, selected_class
 
-            if not (full_name and school_class_id):
-                return render_template("admin_student_form.html",
-                                     error_message="Заполните все обязательные поля.",
-                                     achievements=json.dumps(achievements, ensure_ascii=False),
-                                     grades=grades,
-                                     selected_class=selected_class)
+        if request.method == "POST":
+            full_name, school_class_id, achievements = _parse_student_form()
+            achievements_json = _json_dumps(achievements)
 
-            # Проверяем на возможное дублирование
+            # Одна сессия на весь POST: данные формы (параллели/классы)
+            # загружаем только если нужно перерисовать форму с ошибкой
             with next(get_db_session()) as db:
-                school_class = db.get(SchoolClass, int(school_class_id))
-                if not school_class:
+                if not (full_name and school_class_id):
+                    grades, selected_class = _form_context(db)
                     return render_template("admin_student_form.html",
-                                         error_message="Выбранный класс не найден.",
-                                         achievements=json.dumps(achievements, ensure_ascii=False),
+                                         error_message="Заполните все обязательные поля.",
+                                         achievements=_json_dumps(achievements),
                                          grades=grades,
                                          selected_class=selected_class)
 
-                # Ищем похожих учеников в том же классе
-                similar_students = db.execute(
-                    select(Student).where(
-                        Student.school_class_id == int(school_class_id),
-                        Student.full_name.ilike(f"%{full_name}%")
+                # Существование класса и поиск похожих учеников — один запрос:
+                # outer join по префиксному LIKE на нормализованном ФИО.
+                # Пустой результат означает, что класса нет; NULL справа —
+                # класс есть, дублей не найдено
+                rows = db.execute(
+                    select(SchoolClass.id, Student)
+                    .outerjoin(
+                        Student,
+                        (Student.school_class_id == SchoolClass.id)
+                        & Student.full_name_norm.like(f"{full_name.lower()}%"),
                     )
-                ).scalars().all()
+                    .where(SchoolClass.id == int(school_class_id))
+                ).all()
+
+                if not rows:
+                    grades, selected_class = _form_context(db)
+                    return render_template("admin_student_form.html",
+                                         error_message="Выбранный класс не найден.",
+                                         achievements=_json_dumps(achievements),
+                                         grades=grades,
+                                         selected_class=selected_class)
+
+                similar_students = [student for _, student in rows if student is not None]
 
                 if similar_students:
                     # Показываем предупреждение о дублировании
+                    grades, selected_class = _form_context(db)
                     return render_template("admin_student_form.html",
                                          error_message="Возможное дублирование! Найдены похожие ученики в этом классе.",
                                          similar_students=similar_students,
-                                         achievements=json.dumps(achievements, ensure_ascii=False),
+                                         achievements=_json_dumps(achievements),
                                          grades=grades,
                                          selected_class=selected_class,
                                          form_data={
@@ -497,11 +1012,18 @@ def create_app():
                     school_class_id=int(school_class_id),
                     full_name=full_name,
                     achievements=achievements_json or None,
+                    achievements_count=len(achievements),
                 )
                 db.add(s)
                 db.commit()
+                # Данные изменились: сбрасываем весь кэш (статистика,
+                # снимки учеников, закэшированные страницы)
+                cache.clear()
             return redirect(url_for("admin_class_view", class_id=school_class_id))
 
+        with next(get_db_session()) as db:
+            grades, selected_class = _form_context(db)
+
         return render_template("admin_student_form.html",
                              achievements='[]',
                              grades=grades,
@@ -514,65 +1036,15 @@ def create_app():
         if auth_result != True:
             return auth_result
 
-        with next(get_db_session()) as db:
-            # Загружаем ученика с классом
-            student = db.execute(
-                select(Student).options(
-                    selectinload(Student.school_class).selectinload(SchoolClass.grade)
-                ).where(Student.id == student_id)
-            ).scalar_one_or_none()
-
-            if not student:
-                flash("Ученик не найден", "error")
-                return redirect(url_for("admin_dashboard"))
-
-            # Загружаем параллели с классами и учителями
-            grades_query = db.execute(
-                select(Grade).options(
-                    selectinload(Grade.classes).selectinload(SchoolClass.class_teacher)
-                ).order_by(Grade.grade_number)
-            ).scalars().all()
-
-            # Преобразуем в обычные структуры данных для шаблона
-            grades = []
-            for grade in grades_query:
-                grade_data = {
-                    'id': grade.id,
-                    'grade_name': grade.grade_name,
-                    'grade_number': grade.grade_number,
-                    'classes': [
-                        {
-                            'id': school_class.id,
-                            'class_name': school_class.class_name,
-                            'class_teacher': {
-                                'username': school_class.class_teacher.username if school_class.class_teacher else None
-                            } if school_class.class_teacher else None
-                        } for school_class in grade.classes
-                    ]
-                }
-                grades.append(grade_data)
+        if request.method == "POST":
+            with next(get_db_session()) as db:
+                student = db.get(Student, student_id)
+                if not student:
+                    flash("Ученик не найден", "error")
+                    return redirect(url_for("admin_dashboard"))
 
-            if request.method == "POST":
-                full_name = request.form.get("full_name", "").strip()
-                school_class_id = request.form.get("school_class_id")
-
-                ach_titles = request.form.getlist("ach_title[]")
-                ach_levels = request.form.getlist("ach_level[]")
-                ach_results = request.form.getlist("ach_result[]")
-                ach_years = request.form.getlist("ach_year[]")
-                ach_dates = request.form.getlist("ach_date[]")
-                achievements = []
-                for i in range(len(ach_titles)):
-                    if not (ach_titles[i].strip() and ach_levels[i] and ach_results[i] and ach_years[i] and ach_dates[i]):
-                        continue
-                    achievements.append({
-                        "title": ach_titles[i].strip(),
-                        "level": ach_levels[i],
-                        "result": ach_results[i],
-                        "year": ach_years[i],
-                        "date": ach_dates[i],
-                    })
-                achievements_json = json.dumps(achievements, ensure_ascii=False)
+                full_name, school_class_id, achievements = _parse_student_form()
+                achievements_json = _json_dumps(achievements)
 
                 if not (full_name and school_class_id):
                     # Преобразуем ученика в обычную структуру для шаблона
@@ -584,9 +1056,9 @@ def create_app():
                     }
                     return render_template("admin_student_form.html",
                                          error_message="Заполните все обязательные поля.",
-                                         achievements=json.dumps(achievements, ensure_ascii=False),
+                                         achievements=_json_dumps(achievements),
                                          student=student_data,
-                                         grades=grades)
+                                         grades=_grades_with_classes(db))
 
                 school_class = db.get(SchoolClass, int(school_class_id))
                 if not school_class:
@@ -599,27 +1071,33 @@ def create_app():
                     }
                     return render_template("admin_student_form.html",
                                          error_message="Выбранный класс не найден.",
-                                         achievements=json.dumps(achievements, ensure_ascii=False),
+                                         achievements=_json_dumps(achievements),
                                          student=student_data,
-                                         grades=grades)
+                                         grades=_grades_with_classes(db))
 
                 student.full_name = full_name
+                student.full_name_norm = full_name.lower()
                 student.school_class_id = int(school_class_id)
                 student.achievements = achievements_json or None
+                student.achievements_count = len(achievements)
                 db.commit()
+                # Данные изменились: сбрасываем весь кэш (статистика,
+                # снимки учеников, закэшированные страницы)
+                cache.clear()
 
-                flash(f"Ученик {student.full_name} обновлен", "success")
+                flash(f"Ученик {full_name} обновлен", "success")
                 return redirect(url_for("admin_class_view", class_id=school_class_id))
 
-        # Преобразуем ученика в обычную структуру для шаблона
-        student_data = {
-            'id': student.id,
-            'full_name': student.full_name,
-            'school_class_id': student.school_class_id,
-            'achievements': student.achievements
-        }
+        # GET: снимок ученика берем из кэша, в БД ходим только за списком классов
+        student_data = _get_student_snapshot(student_id)
+        if not student_data:
+            flash("Ученик не найден", "error")
+            return redirect(url_for("admin_dashboard"))
 
-        achievements_json = student.achievements or '[]'
+        with next(get_db_session()) as db:
+            grades = _grades_with_classes(db)
+
+        achievements_json = student_data['achievements'] or '[]'
         return render_template("admin_student_form.html",
                              student=student_data,
                              achievements=safe_from_json(achievements_json),
@@ -633,21 +1111,30 @@ def create_app():
             return auth_result
 
         with next(get_db_session()) as db:
-            student = db.execute(
-                select(Student).options(selectinload(Student.school_class)).where(Student.id == student_id)
-            ).scalar_one_or_none()
+            # Узкая выборка: для проверки прав нужны только id класса и
+            # классного руководителя, а не полные строки ученика и класса
+            row = db.execute(
+                select(Student.school_class_id, SchoolClass.class_teacher_id)
+                .join(SchoolClass, SchoolClass.id == Student.school_class_id)
+                .where(Student.id == student_id)
+            ).one_or_none()
+
+            if row:
+                school_class_id, class_teacher_id = row
 
-            if student:
                 # Проверяем права классного руководителя
                 user_role = session.get("admin_role")
                 user_id = session.get("admin_id")
 
-                if user_role == "class_teacher" and student.school_class.class_teacher_id != user_id:
+                if user_role == "class_teacher" and class_teacher_id != user_id:
                     flash("Вы можете удалять только учеников своего класса", "error")
-                    return redirect(url_for("admin_class_view", class_id=student.school_class_id))
+                    return redirect(url_for("admin_class_view", class_id=school_class_id))
 
-                db.delete(student)
+                db.execute(delete(Student).where(Student.id == student_id))
                 db.commit()
+                # Данные изменились: сбрасываем весь кэш (статистика,
+                # снимки учеников, закэшированные страницы)
+                cache.clear()
         return redirect(url_for("admin_dashboard"))
 
     # Экспорт карточек учеников в Excel
@@ -658,95 +1145,112 @@ def create_app():
             return auth_result
 
         with next(get_db_session()) as db:
-            # Загружаем учеников с классами и учителями для сортировки и экспорта
-            students_query = db.execute(
-                select(Student).options(
-                    selectinload(Student.school_class).selectinload(SchoolClass.class_teacher)
-                ).order_by(
-                    Student.school_class_id.asc(), Student.full_name.asc()
-                )
-            ).scalars().all()
+            # Если у клиента актуальная копия — не собираем книгу вовсе
+            etag = _export_etag(db)
+            if request.if_none_match.contains(etag):
+                return "", 304
 
-            # Сортируем по имени класса в Python (поскольку class_name - это property)
-            students = sorted(students_query, key=lambda s: (s.class_name, s.full_name))
+        filename = f"ученики_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx"
 
-        # Создаем Excel файл
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Карточки учеников"
+        # Дисковый кэш готового файла: ключ тот же, что и ETag данных,
+        # поэтому при неизменных данных повторный экспорт — это send_file
+        cache_dir = os.path.join(app.root_path, "cache", "exports")
+        cache_path = os.path.join(cache_dir, f"{etag}.xlsx")
+        if os.path.exists(cache_path):
+            response = send_file(
+                cache_path,
+                as_attachment=True,
+                download_name=filename,
+                mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            )
+            response.set_etag(etag)
+            return response
 
         # Заголовки на русском
-        headers = ["ID", "ФИО", "Класс", "Кл. руководитель", "Название конкурса", "Уровень", "Результат", "Год", "Дата участия", "Дата создания"]
-        level_map = {'school':'Школьный','district':'Районный','region':'Региональный','russia':'Всероссийский','world':'Международный'}
-        result_map = {'participant':'Участник','prize':'Призёр','winner':'Победитель'}
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.font = Font(bold=True)
-            cell.fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
-            cell.alignment = Alignment(horizontal="center")
-
-        # Данные
-        row = 2
-        for student in students:
-            parsed = []
-            try:
-                parsed = json.loads(student.achievements or "[]")
-                if not isinstance(parsed, list):
-                    parsed = []
-            except Exception:
-                parsed = []
-            if parsed and isinstance(parsed, list) and "title" in parsed[0]:
-                for ach in parsed:
-                    ws.cell(row=row, column=1, value=student.id)
-                    ws.cell(row=row, column=2, value=student.full_name)
-                    ws.cell(row=row, column=3, value=student.class_name)
-                    ws.cell(row=row, column=4, value=student.class_teacher)
-                    ws.cell(row=row, column=5, value=ach.get("title", ""))
-                    ws.cell(row=row, column=6, value=level_map.get(ach.get("level", ""), ach.get("level", "")))
-                    ws.cell(row=row, column=7, value=result_map.get(ach.get("result", ""), ach.get("result", "")))
-                    ws.cell(row=row, column=8, value=ach.get("year", ""))
-                    ws.cell(row=row, column=9, value=ach.get("date", ""))
-                    ws.cell(row=row, column=10, value=student.created_at.strftime("%Y-%m-%d %H:%M") if student.created_at else "")
-                    row += 1
-            else:
-                ws.cell(row=row, column=1, value=student.id)
-                ws.cell(row=row, column=2, value=student.full_name)
-                ws.cell(row=row, column=3, value=student.class_name)
-                ws.cell(row=row, column=4, value=student.class_teacher)
-                ws.cell(row=row, column=5, value=student.achievements or "")
-                for c in range(6,11):
-                    ws.cell(row=row, column=c, value="")
-                ws.cell(row=row, column=10, value=student.created_at.strftime("%Y-%m-%d %H:%M") if student.created_at else "")
-                row += 1
-
-        # Автоподбор ширины колонок
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
+        headers = EXPORT_HEADERS
+
+        # Собираем строки заранее: в write-only режиме ширины колонок
+        # нужно выставить до добавления строк. Выборка потоковая и отдает
+        # Core-кортежи — ORM-объекты не материализуются
+        data_rows, col_widths, add_row = _new_sheet_buffer(headers)
+        with next(get_db_session()) as db:
+            for student in db.execute(_EXPORT_ROWS_STMT).yield_per(1000):
+                created_str = _fmt_created(student.created_at)
+                _append_student_rows(add_row, student, created_str)
+
+        # Write-only книга: строки сериализуются потоково,
+        # объекты Cell не накапливаются в памяти
+        wb = Workbook(write_only=True)
+        wb.add_named_style(HEADER_STYLE)
+        ws = wb.create_sheet("Карточки учеников")
+
+        # Ширины колонок посчитаны по ходу сборки строк
+        for i, width in enumerate(col_widths, 1):
+            ws.column_dimensions[get_column_letter(i)].width = min(width + 2, 50)
+
+        header_cells = []
+        for header in headers:
+            cell = WriteOnlyCell(ws, value=header)
+            cell.style = "header"
+            header_cells.append(cell)
+        ws.append(header_cells)
+
+        for row_values in data_rows:
+            ws.append(row_values)
 
         # Оставляем авто-высоту строк (по умолчанию), т.к. wrap_text=True на ячейке достижений
 
-        # Сохраняем в память
-        output = io.BytesIO()
-        wb.save(output)
-        output.seek(0)
+        # Write-only книга сериализуется ровно один раз: сохраняем во
+        # временный файл, а затем пытаемся продвинуть его в дисковый кэш.
+        # Не вышло — отдаем сам временный файл; повторный wb.save()
+        # write-only книга не переживает
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_dir = cache_dir  # тот же каталог, чтобы os.replace был атомарным
+        except OSError as e:
+            app.logger.warning(f"Каталог кэша экспортов недоступен: {e}")
+            tmp_dir = None
+
+        tmp = tempfile.NamedTemporaryFile(suffix=".xlsx", dir=tmp_dir, delete=False)
+        tmp_path = tmp.name
+        tmp.close()
+        wb.save(tmp_path)
+
+        serve_path = tmp_path
+        if tmp_dir is not None:
+            try:
+                os.replace(tmp_path, cache_path)
+                serve_path = cache_path
+                # Не даем кэшу расти: оставляем несколько последних файлов.
+                # Соседний воркер может чистить кэш параллельно, поэтому
+                # пропавший файл — не ошибка
+                entries = sorted(os.scandir(cache_dir), key=lambda e: e.stat().st_mtime, reverse=True)
+                for entry in entries[8:]:
+                    try:
+                        os.remove(entry.path)
+                    except FileNotFoundError:
+                        pass
+            except OSError as e:
+                app.logger.warning(f"Не удалось закэшировать экспорт: {e}")
 
-        # Возвращаем файл для скачивания
-        filename = f"ученики_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx"
-        return send_file(
-            output,
+        response = send_file(
+            serve_path,
             as_attachment=True,
             download_name=filename,
             mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
         )
+        response.set_etag(etag)
+
+        if serve_path != cache_path:
+            # Файл не попал в кэш — убираем его после отдачи ответа
+            @response.call_on_close
+            def _cleanup():
+                try:
+                    os.remove(serve_path)
+                except OSError:
+                    pass
+
+        return response
 
     # Экспорт по классам: каждый класс на отдельном листе
     @app.route("/admin/export/excel_by_class")
@@ -756,100 +1260,47 @@ def create_app():
             return auth_result
 
         with next(get_db_session()) as db:
-            # Загружаем учеников с классами и учителями для сортировки
-            students_query = db.execute(
-                select(Student).options(
-                    selectinload(Student.school_class).selectinload(SchoolClass.class_teacher)
-                ).order_by(
-                    Student.school_class_id.asc(), Student.full_name.asc()
-                )
-            ).scalars().all()
-
-            # Сортируем по имени класса в Python
-            students = sorted(students_query, key=lambda s: (s.class_name, s.full_name))
+            # Если у клиента актуальная копия — не собираем книгу вовсе
+            etag = _export_etag(db)
+            if request.if_none_match.contains(etag):
+                return "", 304
 
-        # Группируем по классам
-        from collections import defaultdict
-        class_to_students = defaultdict(list)
-        for s in students:
-            class_to_students[s.class_name].append(s)
+        # Write-only книга: листы пишутся потоково, без объектов Cell
+        wb = Workbook(write_only=True)
+        wb.add_named_style(HEADER_STYLE)
 
-        wb = Workbook()
-        # Удаляем дефолтный лист, создадим свои
-        default_ws = wb.active
-        wb.remove(default_ws)
+        headers = EXPORT_HEADERS
 
-        headers = ["ID", "ФИО", "Класс", "Кл. руководитель", "Название конкурса", "Уровень", "Результат", "Год", "Дата участия", "Дата создания"]
-        level_map = {'school':'Школьный','district':'Районный','region':'Региональный','russia':'Всероссийский','world':'Международный'}
-        result_map = {'participant':'Участник','prize':'Призёр','winner':'Победитель'}
-
-        for class_name, class_students in class_to_students.items():
-            ws = wb.create_sheet(title=str(class_name)[:31])
-            # Заголовки
-            for col, header in enumerate(headers, 1):
-                cell = ws.cell(row=1, column=col, value=header)
-                cell.font = Font(bold=True)
-                cell.fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
-                cell.alignment = Alignment(horizontal="center")
-
-            # Данные
-            row = 2
-            for student in class_students:
-                parsed = []
-                try:
-                    parsed = json.loads(student.achievements or "[]")
-                    if not isinstance(parsed, list):
-                        parsed = []
-                except Exception:
-                    parsed = []
-                if parsed and isinstance(parsed, list) and "title" in parsed[0]:
-                    for ach in parsed:
-                        ws.cell(row=row, column=1, value=student.id)
-                        ws.cell(row=row, column=2, value=student.full_name)
-                        ws.cell(row=row, column=3, value=student.class_name)
-                        ws.cell(row=row, column=4, value=student.class_teacher)
-                        ws.cell(row=row, column=5, value=ach.get("title", ""))
-                        ws.cell(row=row, column=6, value=level_map.get(ach.get("level", ""), ach.get("level", "")))
-                        ws.cell(row=row, column=7, value=result_map.get(ach.get("result", ""), ach.get("result", "")))
-                        ws.cell(row=row, column=8, value=ach.get("year", ""))
-                        ws.cell(row=row, column=9, value=ach.get("date", ""))
-                        ws.cell(row=row, column=10, value=student.created_at.strftime("%Y-%m-%d %H:%M") if student.created_at else "")
-                        row += 1
-                else:
-                    ws.cell(row=row, column=1, value=student.id)
-                    ws.cell(row=row, column=2, value=student.full_name)
-                    ws.cell(row=row, column=3, value=student.class_name)
-                    ws.cell(row=row, column=4, value=student.class_teacher)
-                    ws.cell(row=row, column=5, value=student.achievements or "")
-                    for c in range(6,11):
-                        ws.cell(row=row, column=c, value="")
-                    ws.cell(row=row, column=10, value=student.created_at.strftime("%Y-%m-%d %H:%M") if student.created_at else "")
-                    row += 1
-
-            # Автоподбор ширины
-            for column in ws.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 50)
-                ws.column_dimensions[column_letter].width = adjusted_width
-
-        output = io.BytesIO()
-        wb.save(output)
-        output.seek(0)
+        with next(get_db_session()) as db:
+            # Потоковые Core-кортежи, уже отсортированные по классу —
+            # группируем одним проходом, в памяти только текущий лист
+            rows_iter = db.execute(_EXPORT_ROWS_STMT).yield_per(1000)
+            for class_name, class_students in groupby(rows_iter, key=lambda r: r.class_name):
+                ws = wb.create_sheet(title=str(class_name)[:31])
+
+                # Собираем строки листа заранее: в write-only режиме ширины
+                # колонок выставляются до добавления строк
+                data_rows, col_widths, add_row = _new_sheet_buffer(headers)
+                for student in class_students:
+                    created_str = _fmt_created(student.created_at)
+                    _append_student_rows(add_row, student, created_str)
+
+                # Ширины колонок посчитаны по ходу сборки строк
+                for i, width in enumerate(col_widths, 1):
+                    ws.column_dimensions[get_column_letter(i)].width = min(width + 2, 50)
+
+                header_cells = []
+                for header in headers:
+                    cell = WriteOnlyCell(ws, value=header)
+                    cell.style = "header"
+                    header_cells.append(cell)
+                ws.append(header_cells)
+
+                for row_values in data_rows:
+                    ws.append(row_values)
 
         filename = f"ученики_по_классам_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx"
-        return send_file(
-            output,
-            as_attachment=True,
-            download_name=filename,
-            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
+        return _send_workbook(wb, filename, etag=etag)
 
     # Экспорт Excel по выбранному классу (через ?class=7А)
     @app.route("/admin/export/excel_class")
@@ -863,78 +1314,45 @@ def create_app():
             return redirect(url_for("admin_dashboard"))
 
         with next(get_db_session()) as db:
-            stmt = select(Student).where(Student.class_name == class_name).order_by(Student.full_name.asc())
-            students = db.execute(stmt).scalars().all()
-
-        wb = Workbook()
-        ws = wb.active
-        ws.title = (str(class_name) or "Класс")[:31]
-
-        headers = ["ID", "ФИО", "Класс", "Кл. руководитель", "Название конкурса", "Уровень", "Результат", "Год", "Дата участия", "Дата создания"]
-        level_map = {'school':'Школьный','district':'Районный','region':'Региональный','russia':'Всероссийский','world':'Международный'}
-        result_map = {'participant':'Участник','prize':'Призёр','winner':'Победитель'}
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.font = Font(bold=True)
-            cell.fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
-            cell.alignment = Alignment(horizontal="center")
-
-        row = 2
-        for student in students:
-            parsed = []
-            try:
-                parsed = json.loads(student.achievements or "[]")
-                if not isinstance(parsed, list):
-                    parsed = []
-            except Exception:
-                parsed = []
-            if parsed and isinstance(parsed, list) and "title" in parsed[0]:
-                for ach in parsed:
-                    ws.cell(row=row, column=1, value=student.id)
-                    ws.cell(row=row, column=2, value=student.full_name)
-                    ws.cell(row=row, column=3, value=student.class_name)
-                    ws.cell(row=row, column=4, value=student.class_teacher)
-                    ws.cell(row=row, column=5, value=ach.get("title", ""))
-                    ws.cell(row=row, column=6, value=level_map.get(ach.get("level", ""), ach.get("level", "")))
-                    ws.cell(row=row, column=7, value=result_map.get(ach.get("result", ""), ach.get("result", "")))
-                    ws.cell(row=row, column=8, value=ach.get("year", ""))
-                    ws.cell(row=row, column=9, value=ach.get("date", ""))
-                    ws.cell(row=row, column=10, value=student.created_at.strftime("%Y-%m-%d %H:%M") if student.created_at else "")
-                    row += 1
-            else:
-                ws.cell(row=row, column=1, value=student.id)
-                ws.cell(row=row, column=2, value=student.full_name)
-                ws.cell(row=row, column=3, value=student.class_name)
-                ws.cell(row=row, column=4, value=student.class_teacher)
-                ws.cell(row=row, column=5, value=student.achievements or "")
-                for c in range(6,11):
-                    ws.cell(row=row, column=c, value="")
-                ws.cell(row=row, column=10, value=student.created_at.strftime("%Y-%m-%d %H:%M") if student.created_at else "")
-                row += 1
-
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
+            # Если у клиента актуальная копия — не собираем книгу вовсе
+            etag = _export_etag(db, extra=class_name)
+            if request.if_none_match.contains(etag):
+                return "", 304
+
+        # Write-only книга: лист пишется потоково, без объектов Cell
+        wb = Workbook(write_only=True)
+        wb.add_named_style(HEADER_STYLE)
+        ws = wb.create_sheet(title=(str(class_name) or "Класс")[:31])
+
+        headers = EXPORT_HEADERS
+
+        # Собираем строки заранее: в write-only режиме ширины колонок
+        # выставляются до добавления строк. Фильтр по имени класса — через
+        # JOIN (Student.class_name — python-свойство, в WHERE не работает),
+        # выборка потоковая и отдает Core-кортежи вместо ORM-объектов
+        data_rows, col_widths, add_row = _new_sheet_buffer(headers)
+        with next(get_db_session()) as db:
+            stmt = _EXPORT_ROWS_STMT.where(SchoolClass.class_name == class_name)
+            for student in db.execute(stmt).yield_per(1000):
+                created_str = _fmt_created(student.created_at)
+                _append_student_rows(add_row, student, created_str)
 
-        output = io.BytesIO()
-        wb.save(output)
-        output.seek(0)
+        # Ширины колонок посчитаны по ходу сборки строк
+        for i, width in enumerate(col_widths, 1):
+            ws.column_dimensions[get_column_letter(i)].width = min(width + 2, 50)
+
+        header_cells = []
+        for header in headers:
+            cell = WriteOnlyCell(ws, value=header)
+            cell.style = "header"
+            header_cells.append(cell)
+        ws.append(header_cells)
+
+        for row_values in data_rows:
+            ws.append(row_values)
 
         filename = f"ученики_{class_name}_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx"
-        return send_file(
-            output,
-            as_attachment=True,
-            download_name=filename,
-            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
+        return _send_workbook(wb, filename, etag=etag)
 
     # Массовый импорт учеников из Excel
     @app.route("/admin/import/excel", methods=["GET", "POST"])
@@ -957,42 +1375,54 @@ def create_app():
                 flash("Неверный формат файла. Используйте .xlsx или .xls", "error")
                 return redirect(request.url)
 
+            wb = None
             try:
-                from openpyxl import load_workbook
-                wb = load_workbook(file)
+                # read_only: потоковый разбор XML вместо построения
+                # полного дерева ячеек, data_only подставляет значения формул
+                wb = load_workbook(file, read_only=True, data_only=True)
                 ws = wb.active
 
                 imported_count = 0
                 errors = []
+                rows = []
 
                 with next(get_db_session()) as db:
+                    # Справочник классов и существующие ученики — по одному
+                    # запросу, вместо SELECT-проверки дубля на каждую строку
+                    class_ids = {
+                        name: class_id
+                        for class_id, name in db.execute(
+                            select(SchoolClass.id, SchoolClass.class_name)
+                        )
+                    }
+                    existing = set(
+                        db.execute(select(Student.full_name, Student.school_class_id)).all()
+                    )
+
                     for row_idx, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
                         # Ожидаемая структура: ФИО, Класс, Кл. руководитель, Достижения (опционально)
-                        if not row or not row[0] or not row[1] or not row[2]:
+                        # Колонка "Кл. руководитель" игнорируется: руководитель хранится у класса
+                        if not row or not row[0] or not row[1]:
                             continue  # Пропускаем пустые строки
 
                         full_name = str(row[0]).strip()
                         class_name = str(row[1]).strip()
-                        class_teacher = str(row[2]).strip()
                         achievements_text = str(row[3]).strip() if len(row) > 3 and row[3] else None
 
-                        # Проверяем дублирование
-                        existing = db.execute(
-                            select(Student).where(
-                                Student.full_name == full_name,
-                                Student.class_name == class_name
-                            )
-                        ).scalar_one_or_none()
+                        school_class_id = class_ids.get(class_name)
+                        if school_class_id is None:
+                            errors.append(f"Строка {row_idx}: класс {class_name} не найден")
+                            continue
 
-                        if existing:
+                        if (full_name, school_class_id) in existing:
                             errors.append(f"Строка {row_idx}: {full_name} ({class_name}) - уже существует")
                             continue
 
                         # Создаем достижения в формате JSON если есть текст
                         achievements_json = None
+                        ach_list = []
                         if achievements_text:
                             # Простой парсинг: разделяем по точкам с запятой
-                            ach_list = []
                             for ach_text in achievements_text.split(';'):
                                 ach_text = ach_text.strip()
                                 if ach_text:
@@ -1004,19 +1434,138 @@ def create_app():
                                         "date": datetime.now().strftime("%Y-%m-%d")
                                     })
                             if ach_list:
-                                achievements_json = json.dumps(ach_list, ensure_ascii=False)
-
-                        # Создаем ученика
-                        student = Student(
-                            full_name=full_name,
-                            class_name=class_name,
-                            class_teacher=class_teacher,
-                            achievements=achievements_json
+                                achievements_json = _json_dumps(ach_list)
+
+                        rows.append({
+                            "full_name": full_name,
+                            "full_name_norm": full_name.lower(),
+                            "school_class_id": school_class_id,
+                            "achievements": achievements_json,
+                            "achievements_count": len(ach_list),
+                        })
+                        existing.add((full_name, school_class_id))
+
+                    if rows:
+                        # Быстрый executemany SQLAlchemy 2.0: один запрос на все строки
+                        db.execute(insert(Student), rows)
+                        db.commit()
+                        imported_count = len(rows)
+
+                # Данные изменились: сбрасываем весь кэш (статистика,
+                # снимки учеников, закэшированные страницы)
+                cache.clear()
+
+                flash(f"Успешно импортировано {imported_count} учеников", "success")
+                if errors:
+                    flash(f"Ошибки импорта: {'; '.join(errors[:5])}", "warning")  # Показываем первые 5 ошибок
+
+            except Exception as e:
+                flash(f"Ошибка при импорте: {str(e)}", "error")
+            finally:
+                # read_only-книга держит открытым поток файла
+                if wb is not None:
+                    wb.close()
+
+            return redirect(url_for("admin_dashboard"))
+
+        return render_template("admin_import.html")
+
+    # Массовая загрузка учеников из CSV: одна вставка на весь файл
+    @app.route("/admin/students/bulk", methods=["GET", "POST"])
+    def admin_students_bulk():
+        auth_result = require_admin_role()
+        if auth_result != True:
+            return auth_result
+
+        if request.method == "POST":
+            if 'csv_file' not in request.files:
+                flash("Файл не выбран", "error")
+                return redirect(request.url)
+
+            file = request.files['csv_file']
+            if file.filename == '':
+                flash("Файл не выбран", "error")
+                return redirect(request.url)
+
+            if not file.filename.endswith('.csv'):
+                flash("Неверный формат файла. Используйте .csv", "error")
+                return redirect(request.url)
+
+            try:
+                text_stream = io.TextIOWrapper(file.stream, encoding='utf-8-sig')
+                reader = csv.reader(text_stream)
+                next(reader, None)  # Пропускаем строку заголовков
+
+                imported_count = 0
+                errors = []
+                rows = []
+
+                with next(get_db_session()) as db:
+                    # Справочник классов и существующие ученики — по одному запросу,
+                    # вместо поиска класса и проверки дубля на каждую строку файла
+                    class_ids = {
+                        name: class_id
+                        for class_id, name in db.execute(
+                            select(SchoolClass.id, SchoolClass.class_name)
                         )
-                        db.add(student)
-                        imported_count += 1
+                    }
+                    existing = set(
+                        db.execute(select(Student.full_name, Student.school_class_id)).all()
+                    )
+
+                    for row_idx, row in enumerate(reader, start=2):
+                        # Ожидаемая структура: ФИО, Класс, Достижения (опционально)
+                        if len(row) < 2 or not row[0].strip() or not row[1].strip():
+                            continue  # Пропускаем пустые строки
+
+                        full_name = row[0].strip()
+                        class_name = row[1].strip()
+                        achievements_text = row[2].strip() if len(row) > 2 else None
+
+                        school_class_id = class_ids.get(class_name)
+                        if school_class_id is None:
+                            errors.append(f"Строка {row_idx}: класс {class_name} не найден")
+                            continue
 
-                    db.commit()
+                        if (full_name, school_class_id) in existing:
+                            errors.append(f"Строка {row_idx}: {full_name} ({class_name}) - уже существует")
+                            continue
+
+                        # Создаем достижения в формате JSON если есть текст
+                        achievements_json = None
+                        ach_list = []
+                        if achievements_text:
+                            for ach_text in achievements_text.split(';'):
+                                ach_text = ach_text.strip()
+                                if ach_text:
+                                    ach_list.append({
+                                        "title": ach_text,
+                                        "level": "school",
+                                        "result": "participant",
+                                        "year": "25/26",
+                                        "date": datetime.now().strftime("%Y-%m-%d")
+                                    })
+                            if ach_list:
+                                achievements_json = _json_dumps(ach_list)
+
+                        rows.append({
+                            "full_name": full_name,
+                            "full_name_norm": full_name.lower(),
+                            "school_class_id": school_class_id,
+                            "achievements": achievements_json,
+                            "achievements_count": len(ach_list),
+                        })
+                        existing.add((full_name, school_class_id))
+
+                    if rows:
+                        # Быстрый executemany SQLAlchemy 2.0: один запрос на все строки
+                        db.execute(insert(Student), rows)
+                        db.commit()
+                        imported_count = len(rows)
+
+                # Данные изменились: сбрасываем весь кэш (статистика,
+                # снимки учеников, закэшированные страницы)
+                cache.clear()
 
                 flash(f"Успешно импортировано {imported_count} учеников", "success")
                 if errors:
@@ -1027,7 +1576,7 @@ def create_app():
 
             return redirect(url_for("admin_dashboard"))
 
-        return render_template("admin_import.html")
+        return render_template("admin_bulk_import.html")
 
     # Управление бэкапами базы данных
     @app.route("/admin/backups", methods=["GET", "POST"])
@@ -1122,6 +1671,7 @@ def create_app():
                 with next(get_db_session()) as db:
                     new_user = create_admin_user(db, username, password, role)
                     flash(f"Пользователь {new_user.username} успешно создан", "success")
+                cache.clear()
                 return redirect(url_for("admin_users"))
             except ValueError as e:
                 flash(str(e), "error")
@@ -1147,7 +1697,7 @@ def create_app():
                 password = request.form.get("password", "").strip()
                 confirm_password = request.form.get("confirm_password", "").strip()
                 role = request.form.get("role", user.role)
-                is_active = request.form.get("is_active", "1")
+                is_active = 1 if request.form.get("is_active", "1") == "1" else 0
 
                 if not username:
                     flash("Имя пользователя обязательно", "error")
@@ -1171,6 +1721,8 @@ def create_app():
                         update_data["password"] = password
 
                     updated_user = update_admin_user(db, user_id, **update_data)
+                    # Имя руководителя видно на карточках классов
+                    cache.clear()
                     flash(f"Пользователь {updated_user.username} обновлен", "success")
                     return redirect(url_for("admin_users"))
                 except ValueError as e:
@@ -1193,6 +1745,7 @@ def create_app():
                 if user:
                     username = user.username
                     delete_admin_user(db, user_id)
+                    cache.clear()
                     flash(f"Пользователь {username} удален", "success")
                 else:
                     flash("Пользователь не найден", "error")
@@ -1308,6 +1861,7 @@ def create_app():
                     school_class = create_school_class(db, int(grade_id), class_letter, class_teacher_id)
                     app.logger.info(f"Класс {school_class.class_name} успешно создан администратором")
                     flash(f"Класс {school_class.class_name} успешно создан", "success")
+                cache.clear()
                 return redirect(url_for("admin_classes"))
             except ValueError as e:
                 error_msg = str(e)
@@ -1340,6 +1894,8 @@ def create_app():
 
                 try:
                     updated_class = update_school_class(db, class_id, class_teacher_id)
+                    # Руководитель виден на карточках классов
+                    cache.clear()
                     flash(f"Класс {updated_class.class_name} обновлен", "success")
                     return redirect(url_for("admin_classes"))
                 except ValueError as e:
@@ -1374,6 +1930,7 @@ def create_app():
                 class_name = school_class.class_name
                 db.delete(school_class)
                 db.commit()
+                cache.clear()
                 flash(f"Класс {class_name} удален", "success")
             except Exception as e:
                 db.rollback()
@@ -1401,7 +1958,13 @@ def create_app():
                 flash("Класс не найден", "error")
                 return redirect(url_for("admin_classes"))
 
-            students = search_students(db, school_class_id=class_id)
+            # Шаблону нужны только id, ФИО и достижения — не гидратируем
+            # остальные колонки
+            students = search_students(
+                db,
+                school_class_id=class_id,
+                columns=[Student.id, Student.full_name, Student.achievements],
+            )
 
             # Преобразуем в обычные структуры данных для шаблона
             class_data = {
@@ -1431,90 +1994,91 @@ def create_app():
             return redirect(url_for("admin_class_view", class_id=class_id))
 
         with next(get_db_session()) as db:
-            # Загружаем класс с учениками
-            school_class = db.execute(
-                select(SchoolClass).options(selectinload(SchoolClass.students)).where(SchoolClass.id == class_id)
-            ).scalar_one_or_none()
+            # Если у клиента актуальная копия — не собираем отчет вовсе
+            etag = _export_etag(db, extra=str(class_id))
+            if request.if_none_match.contains(etag):
+                return "", 304
+
+            # Класс нужен только ради имени; учеников не тянем коллекцией,
+            # а читаем потоково узким запросом ниже
+            school_class = db.get(SchoolClass, class_id)
 
             if not school_class:
                 flash("Класс не найден", "error")
                 return redirect(url_for("admin_classes"))
 
-            # Создаем Excel файл для этого класса
-            wb = Workbook()
-            ws = wb.active
-            ws.title = f"Отчет класса {school_class.class_name}"
+            students_iter = db.execute(
+                select(Student.id, Student.full_name, Student.achievements, Student.created_at)
+                .where(Student.school_class_id == class_id)
+                .order_by(Student.full_name.asc())
+                .execution_options(yield_per=500)
+            )
+
+            # Write-only книга: лист пишется потоково, без объектов Cell
+            wb = Workbook(write_only=True)
+            ws = wb.create_sheet(title=f"Отчет класса {school_class.class_name}"[:31])
 
             # Заголовки
             headers = ["ID", "ФИО", "Название конкурса", "Уровень", "Результат", "Год", "Дата участия", "Дата создания"]
-            level_map = {'school':'Школьный','district':'Районный','region':'Региональный','russia':'Всероссийский','world':'Международный'}
-            result_map = {'participant':'Участник','prize':'Призёр','winner':'Победитель'}
-
-            for col_num, header in enumerate(headers, 1):
-                ws.cell(row=1, column=col_num, value=header)
-
-            row = 2
-            for student in school_class.students:
-                parsed = []
-                try:
-                    parsed = json.loads(student.achievements or "[]")
-                    if not isinstance(parsed, list):
-                        parsed = []
-                except Exception:
-                    parsed = []
 
+            # Собираем строки заранее: в write-only режиме ширины колонок
+            # выставляются до добавления строк
+            data_rows, col_widths, add_row = _new_sheet_buffer(headers)
+            lvl = LEVEL_MAP.get
+            res = RESULT_MAP.get
+            for student in students_iter:
+                raw = student.achievements
+                parsed = _parse_achievements_cached(raw) if raw else []
+
+                # Дата создания одинакова для всех строк ученика —
+                # форматируем один раз
+                created_str = _fmt_created_date(student.created_at)
                 if parsed and isinstance(parsed, list) and "title" in parsed[0]:
                     for ach in parsed:
-                        ws.cell(row=row, column=1, value=student.id)
-                        ws.cell(row=row, column=2, value=student.full_name)
-                        ws.cell(row=row, column=3, value=ach.get('title', ''))
-                        ws.cell(row=row, column=4, value=level_map.get(ach.get('level', ''), ach.get('level', '')))
-                        ws.cell(row=row, column=5, value=result_map.get(ach.get('result', ''), ach.get('result', '')))
-                        ws.cell(row=row, column=6, value=ach.get('year', ''))
-                        ws.cell(row=row, column=7, value=ach.get('date', ''))
-                        ws.cell(row=row, column=8, value=student.created_at.strftime('%Y-%m-%d') if student.created_at else '')
-                        row += 1
+                        add_row((
+                            student.id,
+                            student.full_name,
+                            ach.get('title', ''),
+                            lvl(ach.get('level', ''), ach.get('level', '')),
+                            res(ach.get('result', ''), ach.get('result', '')),
+                            ach.get('year', ''),
+                            ach.get('date', ''),
+                            created_str,
+                        ))
                 else:
                     # Студент без достижений
-                    ws.cell(row=row, column=1, value=student.id)
-                    ws.cell(row=row, column=2, value=student.full_name)
-                    ws.cell(row=row, column=3, value="Достижения не добавлены")
-                    ws.cell(row=row, column=8, value=student.created_at.strftime('%Y-%m-%d') if student.created_at else '')
-                    row += 1
-
-            # Автонастройка ширины колонок
-            for column in ws.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 50)  # Максимальная ширина 50
-                ws.column_dimensions[column_letter].width = adjusted_width
+                    add_row((
+                        student.id,
+                        student.full_name,
+                        "Достижения не добавлены",
+                        "", "", "", "",
+                        created_str,
+                    ))
 
-            # Создаем response
-            from io import BytesIO
-            bio = BytesIO()
-            wb.save(bio)
-            bio.seek(0)
+            # Ширины колонок посчитаны по ходу сборки строк
+            for i, width in enumerate(col_widths, 1):
+                ws.column_dimensions[get_column_letter(i)].width = min(width + 2, 50)  # Максимальная ширина 50
 
-            response = send_file(
-                bio,
-                as_attachment=True,
-                download_name=f'отчет_класса_{school_class.class_name}_{datetime.now().strftime("%Y%m%d_%H%M")}.xlsx',
-                mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-            )
+            ws.append(headers)
+            for row_values in data_rows:
+                ws.append(row_values)
 
-            return response
+            filename = f'отчет_класса_{school_class.class_name}_{datetime.now().strftime("%Y%m%d_%H%M")}.xlsx'
+            return _send_workbook(wb, filename, etag=etag)
 
     # Временный маршрут для проверки
     @app.route("/test")
     def test_route():
         return "Приложение работает! Доступ по HTTP работает."
 
+    # Прогреваем кэш шаблонов: самые ходовые страницы компилируются
+    # на старте процесса, а не на первом запросе пользователя
+    for template_name in ("index.html", "admin_dashboard.html", "admin_student_form.html"):
+        try:
+            app.jinja_env.get_template(template_name)
+        except Exception as e:
+            app.logger.warning(f"Не удалось прогреть шаблон {template_name}: {e}")
+
     return app
 
 
@@ -1527,29 +2091,40 @@ if __name__ == "__main__":
     Запуск приложения в режиме разработки.
     В продакшене используйте systemd service или WSGI сервер (gunicorn, uwsgi).
     """
-    # Настраиваем логирование для более подробного вывода
-    logging.basicConfig(
-        level=logging.DEBUG,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.StreamHandler(),  # Вывод в консоль
-            logging.FileHandler('app.log')  # Сохранение в файл
-        ]
+    # Настраиваем логирование для более подробного вывода.
+    # Обработчики запросов кладут записи в очередь за O(1), а запись в
+    # файл и консоль делает фоновый поток QueueListener — диск не
+    # тормозит обработку HTTP-запросов
+    log_queue = queue.SimpleQueue()
+    log_listener = logging.handlers.QueueListener(
+        log_queue,
+        logging.StreamHandler(),  # Вывод в консоль
+        logging.FileHandler('app.log'),  # Сохранение в файл
+        respect_handler_level=True,
     )
+    log_listener.start()
+    atexit.register(log_listener.stop)
+
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.setFormatter(formatter)
+    logging.basicConfig(level=logging.DEBUG, handlers=[queue_handler])
 
     # Настраиваем логирование Werkzeug (HTTP запросы)
     werkzeug_logger = logging.getLogger('werkzeug')
     werkzeug_logger.setLevel(logging.INFO)
 
-    # Добавляем собственное логирование HTTP запросов
-    @app.before_request
-    def log_request_info():
-        app.logger.info(f'{request.method} {request.url} - {request.remote_addr}')
+    # Добавляем собственное логирование HTTP запросов (только в отладке:
+    # в боевом режиме две лишние записи на запрос не нужны)
+    if os.environ.get("FLASK_DEBUG", "True").lower() == "true":
+        @app.before_request
+        def log_request_info():
+            app.logger.info(f'{request.method} {request.url} - {request.remote_addr}')
 
-    @app.after_request
-    def log_response_info(response):
-        app.logger.info(f'Response: {response.status_code}')
-        return response
+        @app.after_request
+        def log_response_info(response):
+            app.logger.info(f'Response: {response.status_code}')
+            return response
 
     # Включаем подробные логи для нашего приложения
     app_logger = logging.getLogger('app')
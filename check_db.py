@@ -30,7 +30,7 @@ try:
             print(f"📊 Найдено администраторов: {len(admins)}")
 
             for admin in admins:
-                print(f"   - {admin.username} (роль: {admin.role}, активен: {'да' if admin.is_active == '1' else 'нет'})")
+                print(f"   - {admin.username} (роль: {admin.role}, активен: {'да' if admin.is_active == 1 else 'нет'})")
 
             # Проверяем аутентификацию
             print("\n🔐 Проверка аутентификации...")
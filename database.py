@@ -1,18 +1,27 @@
 
 import bcrypt
+import re
 import shutil
+import sqlite3
 import os
 from datetime import datetime
 from dataclasses import dataclass
+from functools import lru_cache
 
 # Импортируем нужные классы из SQLAlchemy
-from sqlalchemy import Column, DateTime, Integer, String, Text, create_engine, func, select, text, ForeignKey
-from sqlalchemy.orm import Session, declarative_base, sessionmaker, relationship
+from sqlalchemy import Column, DateTime, Integer, String, Text, bindparam, case, create_engine, event, func, select, text, ForeignKey
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.orm import Session, declarative_base, defer, load_only, scoped_session, selectinload, sessionmaker, relationship
 
 
 # Создаем базовый класс для моделей
 Base = declarative_base()
 
+# Стоимость bcrypt (2^N итераций на хеширование): настраивается под
+# железо через переменную окружения, по умолчанию — библиотечные 12
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))
+
 # Константы ролей пользователей
 USER_ROLES = {
     'admin': {'name': 'Администратор', 'description': 'Полный доступ ко всем функциям'},
@@ -29,46 +38,227 @@ ROLE_PERMISSIONS = {
     'class_teacher': ['manage_class', 'edit_class_students', 'view_reports', 'export_class_reports', 'add_achievements']
 }
 
+# Те же права как frozenset: проверка вхождения за O(1) вместо скана
+# списка — check_user_permission дергается на каждом запросе
+_ROLE_PERMISSIONS_FS = {role: frozenset(perms) for role, perms in ROLE_PERMISSIONS.items()}
+
 
+@lru_cache(maxsize=4)
 def get_engine(db_url: str = "sqlite:///app.db"):
-    # Создаем подключение к SQLite. future=True для нового стиля API
-    return create_engine(db_url, echo=False, future=True)
+    # Создаем подключение к SQLite. future=True для нового стиля API.
+    # Движок мемоизирован: повторные вызовы (init_db, фоновые задачи)
+    # получают тот же объект и общий пул соединений вместо создания нового.
+    # QueuePool задан явно, а check_same_thread выключен, чтобы потоки
+    # gthread-воркеров переиспользовали прогретые соединения (mmap, кэш
+    # страниц из PRAGMA) вместо открытия файла на каждый поток
+    return create_engine(
+        db_url,
+        echo=False,
+        future=True,
+        poolclass=QueuePool,
+        connect_args={"check_same_thread": False},
+        pool_size=10,
+        max_overflow=20,
+        pool_pre_ping=True,
+        pool_recycle=3600,
+        # Запас кэша скомпилированного SQL: формы запросов поиска и
+        # экспортов не вытесняют друг друга при всплесках трафика
+        query_cache_size=1200,
+    )
+
+
+@event.listens_for(get_engine(), "connect")
+def _set_sqlite_pragmas(dbapi_connection, _connection_record):
+    """Выставляет PRAGMA на каждое физическое соединение из пула.
+
+    cache_size, synchronous и temp_store действуют на уровне соединения
+    и сбрасываются для каждого нового подключения, поэтому одной
+    настройки в init_db недостаточно. journal_mode=WAL персистентен,
+    но повторная установка дешева и страхует свежесозданные файлы БД.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.executescript(
+        "PRAGMA journal_mode=WAL;"
+        "PRAGMA synchronous=NORMAL;"
+        "PRAGMA cache_size=-64000;"  # 64MB кэш страниц
+        "PRAGMA temp_store=MEMORY;"
+        "PRAGMA mmap_size=268435456;"  # 256MB mmap вместо read()
+        "PRAGMA busy_timeout=5000;"  # ждем блокировку, а не падаем сразу
+    )
+    cursor.close()
+
+
+@event.listens_for(get_engine(), "close")
+def _optimize_on_close(dbapi_connection, _connection_record):
+    """PRAGMA optimize перед закрытием физического соединения.
+
+    Почти бесплатно обновляет статистику планировщика по рекомендации
+    документации SQLite для долгоживущих соединений.
+    """
+    try:
+        dbapi_connection.execute("PRAGMA optimize")
+    except Exception:
+        pass  # соединение может закрываться уже в нерабочем состоянии
 
 
 # Фабрика сессий. Через нее будем получать доступ к БД
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
 
+# Потокo-локальный реестр сессий: в рамках одного потока (запроса)
+# переиспользуется один объект Session вместо создания нового на каждый
+# блок with; close() лишь завершает транзакцию и возвращает соединение в пул
+ScopedSession = scoped_session(SessionLocal)
+
 
 def init_db() -> None:
     """Создаем таблицы в БД, если их еще нет и оптимизируем."""
     engine = get_engine()
     Base.metadata.create_all(bind=engine)
 
-    # Создаем тестовую параллель для демонстрации (если таблица пустая)
-    create_demo_grade_if_empty()
+    # Догоняющие миграции для старых баз: денормализованный счетчик
+    # достижений и нормализованное ФИО для индексного поиска
+    with engine.connect() as conn:
+        columns = {
+            row[1] for row in conn.execute(text("PRAGMA table_info(students)"))
+        }
+        if "achievements_count" not in columns:
+            conn.execute(text(
+                "ALTER TABLE students ADD COLUMN achievements_count INTEGER NOT NULL DEFAULT 0"
+            ))
+            # Backfill целиком в SQL, без разбора JSON в Python: каждая
+            # запись достижения содержит ровно одно вхождение ключа "title"
+            conn.execute(text(
+                "UPDATE students SET achievements_count = CASE "
+                "WHEN achievements IS NULL OR achievements = '' THEN 0 "
+                "ELSE (length(achievements) - length(replace(achievements, '\"title\"', ''))) / 7 "
+                "END"
+            ))
+            conn.commit()
+        if "full_name_norm" not in columns:
+            conn.execute(text("ALTER TABLE students ADD COLUMN full_name_norm VARCHAR(255)"))
+            conn.execute(text(
+                "UPDATE students SET full_name_norm = lower(full_name) WHERE full_name_norm IS NULL"
+            ))
+            conn.commit()
+        if "updated_at" not in columns:
+            conn.execute(text("ALTER TABLE students ADD COLUMN updated_at DATETIME"))
+            conn.execute(text(
+                "UPDATE students SET updated_at = created_at WHERE updated_at IS NULL"
+            ))
+            conn.commit()
+
+        # Те же догоняющие updated_at для классов и пользователей:
+        # их правки тоже попадают в экспорт и на главную
+        for table in ("school_classes", "admin_users"):
+            table_columns = {
+                row[1] for row in conn.execute(text(f"PRAGMA table_info({table})"))
+            }
+            if "updated_at" not in table_columns:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN updated_at DATETIME"))
+                conn.execute(text(
+                    f"UPDATE {table} SET updated_at = created_at WHERE updated_at IS NULL"
+                ))
+                conn.commit()
+
+        # is_active раньше был VARCHAR(1) '1'/'0' — перегоняем в INTEGER,
+        # чтобы предикат логина сравнивал числа, а не строки с коллацией
+        is_active_type = conn.execute(text(
+            "SELECT type FROM pragma_table_info('admin_users') WHERE name = 'is_active'"
+        )).scalar()
+        if is_active_type and is_active_type.upper() != "INTEGER":
+            conn.execute(text(
+                "ALTER TABLE admin_users ADD COLUMN is_active_int INTEGER NOT NULL DEFAULT 1"
+            ))
+            conn.execute(text(
+                "UPDATE admin_users SET is_active_int = CAST(is_active AS INTEGER)"
+            ))
+            conn.execute(text("ALTER TABLE admin_users DROP COLUMN is_active"))
+            conn.execute(text(
+                "ALTER TABLE admin_users RENAME COLUMN is_active_int TO is_active"
+            ))
+            conn.commit()
+
+    # Демо-наполнение только на свежей базе: PRAGMA user_version читается
+    # из заголовка файла, без сессии и COUNT по параллелям на каждый старт
+    with engine.connect() as conn:
+        schema_version = conn.execute(text("PRAGMA user_version")).scalar() or 0
+
+    if schema_version < 1:
+        create_demo_grade_if_empty()
+        with engine.connect() as conn:
+            conn.execute(text("PRAGMA user_version = 1"))
+            conn.commit()
 
     # Оптимизация базы данных для SQLite
+    # (PRAGMA выставляются на каждое соединение в _set_sqlite_pragmas)
     with engine.connect() as conn:
-        # Включаем WAL режим для лучшей производительности
-        conn.execute(text("PRAGMA journal_mode=WAL"))
-        conn.execute(text("PRAGMA synchronous=NORMAL"))
-        conn.execute(text("PRAGMA cache_size=-64000"))  # 64MB кэш
-        conn.execute(text("PRAGMA temp_store=MEMORY"))
-
-        # Создаем дополнительные индексы для оптимизации поиска
+        # Создаем дополнительные индексы для оптимизации поиска.
+        # Весь DDL уходит одним executescript: один проход подготовки
+        # вместо отдельного compile/execute на каждый оператор
         try:
-            # Индекс для поиска по классу
-            conn.execute(text("CREATE INDEX IF NOT EXISTS idx_students_school_class_id ON students(school_class_id)"))
-            # Индекс для поиска по имени ученика
-            conn.execute(text("CREATE INDEX IF NOT EXISTS idx_students_full_name ON students(full_name)"))
-            # Индекс для поиска по дате создания
-            conn.execute(text("CREATE INDEX IF NOT EXISTS idx_students_created_at ON students(created_at DESC)"))
-            # Индексы для классов
-            conn.execute(text("CREATE INDEX IF NOT EXISTS idx_school_classes_grade_id ON school_classes(grade_id)"))
-            conn.execute(text("CREATE INDEX IF NOT EXISTS idx_school_classes_class_name ON school_classes(class_name)"))
+            conn.connection.executescript("""
+                -- Индекс для поиска по классу
+                CREATE INDEX IF NOT EXISTS idx_students_school_class_id ON students(school_class_id);
+                -- Индекс для поиска по имени ученика
+                CREATE INDEX IF NOT EXISTS idx_students_full_name ON students(full_name);
+                -- Индекс по нормализованному ФИО: префиксный LIKE идет по B-дереву
+                CREATE INDEX IF NOT EXISTS idx_students_full_name_norm ON students(full_name_norm);
+                -- Индекс для поиска по дате создания
+                CREATE INDEX IF NOT EXISTS idx_students_created_at ON students(created_at DESC);
+                -- Покрывающий индекс под типовую выборку «ученики класса по
+                -- алфавиту»: закрывает фильтр, сортировку и created_at, так что
+                -- узкие списочные запросы (id, ФИО, дата) идут только по
+                -- индексу, без обращения к основной таблице
+                CREATE INDEX IF NOT EXISTS idx_students_class_fn_cover ON students(school_class_id, full_name, created_at);
+                -- Прежний составной индекс — префикс покрывающего, дубль не нужен
+                DROP INDEX IF EXISTS idx_students_class_full_name;
+                -- Индексы для классов
+                CREATE INDEX IF NOT EXISTS idx_school_classes_grade_id ON school_classes(grade_id);
+                -- Индекс по class_name не создаем: его уже дает UNIQUE-ограничение
+                DROP INDEX IF EXISTS idx_school_classes_class_name;
+                -- Индекс для поиска классов по классному руководителю
+                CREATE INDEX IF NOT EXISTS idx_school_classes_class_teacher_id ON school_classes(class_teacher_id);
+            """)
         except Exception as e:
             print(f"Предупреждение при создании индексов: {e}")
 
+        # Полнотекстовый индекс по ФИО: поиск подстроки через MATCH по
+        # инвертированному индексу вместо LIKE '%...%' с полным сканом
+        try:
+            fts_exists = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='students_fts'"
+            )).scalar() is not None
+            conn.execute(text(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS students_fts USING fts5("
+                "full_name, content='students', content_rowid='id', "
+                "tokenize='unicode61 remove_diacritics 2')"
+            ))
+            # Триггеры держат FTS-таблицу в синхроне с students
+            conn.execute(text(
+                "CREATE TRIGGER IF NOT EXISTS students_fts_ai AFTER INSERT ON students BEGIN "
+                "INSERT INTO students_fts(rowid, full_name) VALUES (new.id, new.full_name); END"
+            ))
+            conn.execute(text(
+                "CREATE TRIGGER IF NOT EXISTS students_fts_ad AFTER DELETE ON students BEGIN "
+                "INSERT INTO students_fts(students_fts, rowid, full_name) "
+                "VALUES ('delete', old.id, old.full_name); END"
+            ))
+            conn.execute(text(
+                "CREATE TRIGGER IF NOT EXISTS students_fts_au AFTER UPDATE OF full_name ON students BEGIN "
+                "INSERT INTO students_fts(students_fts, rowid, full_name) "
+                "VALUES ('delete', old.id, old.full_name); "
+                "INSERT INTO students_fts(rowid, full_name) VALUES (new.id, new.full_name); END"
+            ))
+            if not fts_exists:
+                # Первичное наполнение из уже существующих строк
+                conn.execute(text("INSERT INTO students_fts(students_fts) VALUES ('rebuild')"))
+        except Exception as e:
+            print(f"Предупреждение при создании FTS-индекса: {e}")
+
+        # Статистика для планировщика: без sqlite_stat1 SQLite может
+        # выбрать не тот индекс при комбинированных фильтрах поиска
+        conn.execute(text("ANALYZE"))
+
         conn.commit()
 
 
@@ -76,28 +266,32 @@ def create_demo_grade_if_empty() -> None:
     """Создать тестовую параллель 10 классов, если база данных пустая."""
     db = SessionLocal()
     try:
-        # Проверяем, есть ли уже параллели
-        existing_grades = db.execute(select(func.count()).select_from(Grade)).scalar() or 0
+        # Проверяем, есть ли уже параллели: достаточно одной записи,
+        # COUNT(*) обошел бы весь индекс ради сравнения с нулем
+        has_grades = db.execute(select(1).select_from(Grade).limit(1)).first() is not None
 
-        if existing_grades == 0:
+        if not has_grades:
             print("Создание тестовой параллели 10 классов...")
-            # Создаем параллель 10 классов
+            # Параллель и классы А, Б, В пишутся одной транзакцией:
+            # один commit (один fsync WAL) вместо четырех
             grade = Grade(grade_number=10)
             db.add(grade)
-            db.commit()
-            db.refresh(grade)
+            db.flush()  # получаем grade.id без завершения транзакции
 
-            # Создаем классы А, Б, В для 10 параллели
+            new_classes = []
             for letter in ['А', 'Б', 'В']:
                 try:
-                    create_school_class(db, grade.id, letter)
+                    new_classes.append(_build_school_class(db, grade, letter))
                 except ValueError:
                     # Класс уже существует, пропускаем
                     pass
 
+            db.add_all(new_classes)
+            db.commit()
+
             print("Тестовая параллель создана успешно!")
         else:
-            print(f"Найдено {existing_grades} параллелей, тестовая параллель не создается.")
+            print("Параллели уже существуют, тестовая параллель не создается.")
 
     except Exception as e:
         db.rollback()
@@ -107,8 +301,12 @@ def create_demo_grade_if_empty() -> None:
 
 
 def get_db_session():
-    """Простой генератор, который отдает сессию и закрывает ее потом."""
-    db = SessionLocal()
+    """Простой генератор, который отдает сессию и закрывает ее потом.
+
+    Сессия берется из потоко-локального реестра ScopedSession, так что
+    повторные обращения внутри одного запроса получают тот же объект.
+    """
+    db = ScopedSession()
     try:
         yield db
     finally:
@@ -123,12 +321,17 @@ class AdminUserModel(Base):
     username = Column(String(50), unique=True, nullable=False, index=True)
     password_hash = Column(String(255), nullable=False)  # Хешированный пароль
     role = Column(String(20), nullable=False, default="admin")  # admin, deputy, teacher, class_teacher
-    is_active = Column(String(1), nullable=False, default="1")  # 1 - активен, 0 - заблокирован
+    is_active = Column(Integer, nullable=False, default=1)  # 1 - активен, 0 - заблокирован
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    # Время последнего изменения: переименование руководителя должно
+    # инвалидировать ETag экспортов и главной страницы
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), default=func.now(), onupdate=func.now())
 
     def set_password(self, password: str) -> None:
         """Устанавливает хешированный пароль."""
-        self.password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        self.password_hash = bcrypt.hashpw(
+            password.encode('utf-8'), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
+        ).decode('utf-8')
 
     def check_password(self, password: str) -> bool:
         """Проверяет пароль."""
@@ -149,13 +352,11 @@ def get_admin_user() -> AdminUser:
 
 def create_default_admin() -> None:
     """Создает дефолтного администратора, если его нет в базе."""
-    import os
-
     db = SessionLocal()
     try:
-        # Проверяем, есть ли уже админы
-        admin_count = db.execute(select(func.count()).select_from(AdminUserModel)).scalar()
-        if admin_count == 0:
+        # Проверяем, есть ли уже админы (одной записи достаточно)
+        has_admins = db.execute(select(1).select_from(AdminUserModel).limit(1)).first() is not None
+        if not has_admins:
             # Получаем настройки из переменных окружения
             admin_username = os.environ.get("ADMIN_USERNAME", "admin")
             admin_password = os.environ.get("ADMIN_PASSWORD")
@@ -177,22 +378,45 @@ def create_default_admin() -> None:
         db.close()
 
 
-def authenticate_admin(username: str, password: str) -> AdminUserModel | None:
-    """Аутентифицирует администратора."""
-    db = SessionLocal()
+# Фиктивный хеш, чтобы логин с неизвестным именем пользователя стоил
+# столько же bcrypt-работы, сколько с неверным паролем: по времени
+# ответа нельзя перебирать существующие логины. Считается один раз
+# при импорте (с preload_app — до форка воркеров)
+_DUMMY_HASH = bcrypt.hashpw(b"dummy", bcrypt.gensalt(rounds=BCRYPT_ROUNDS))
+
+# Форма запроса логина неизменна — собираем дерево select один раз на
+# модуль, в рантайме остается только подстановка bind-параметра
+_AUTH_STMT = select(AdminUserModel).where(
+    AdminUserModel.username == bindparam("username"),
+    AdminUserModel.is_active == 1,
+)
+
+
+def authenticate_admin(username: str, password: str, db: Session | None = None) -> AdminUserModel | None:
+    """Аутентифицирует администратора.
+
+    db — уже открытая сессия запроса; если не передана, берется и
+    закрывается собственная (лишний чекаут соединения из пула).
+    """
+    owns_session = db is None
+    if owns_session:
+        db = SessionLocal()
     try:
         admin = db.execute(
-            select(AdminUserModel).where(
-                AdminUserModel.username == username,
-                AdminUserModel.is_active == "1"
-            )
+            _AUTH_STMT, {"username": username}
         ).scalar_one_or_none()
 
-        if admin and admin.check_password(password):
+        if admin is None:
+            # Выравниваем время ответа для несуществующего имени
+            bcrypt.checkpw(password.encode('utf-8'), _DUMMY_HASH)
+            return None
+
+        if admin.check_password(password):
             return admin
         return None
     finally:
-        db.close()
+        if owns_session:
+            db.close()
 
 
 class Grade(Base):
@@ -222,27 +446,19 @@ class SchoolClass(Base):
     id = Column(Integer, primary_key=True, index=True)
     grade_id = Column(Integer, ForeignKey("grades.id"), nullable=False, index=True)
     class_letter = Column(String(10), nullable=False)  # Буква класса (А, Б, В, Г)
-    class_name = Column(String(50), nullable=False, unique=True, index=True)  # Полное имя (7А, 8Б)
+    # unique=True уже создает B-дерево, отдельный index=True был бы дублем
+    class_name = Column(String(50), nullable=False, unique=True)  # Полное имя (7А, 8Б)
     class_teacher_id = Column(Integer, ForeignKey("admin_users.id"), nullable=True)  # Классный руководитель
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    # Время последнего изменения: смена руководителя должна
+    # инвалидировать ETag экспортов и главной страницы
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), default=func.now(), onupdate=func.now())
 
     # Отношения
     grade = relationship("Grade", back_populates="classes")
     class_teacher = relationship("AdminUserModel", foreign_keys=[class_teacher_id])
     students = relationship("Student", back_populates="school_class", cascade="all, delete-orphan")
 
-    def __init__(self, **kwargs):
-        if 'grade_id' in kwargs and 'class_letter' in kwargs:
-            # Найдем номер параллели для создания полного имени класса
-            db = SessionLocal()
-            try:
-                grade = db.get(Grade, kwargs['grade_id'])
-                if grade:
-                    kwargs['class_name'] = f"{grade.grade_number}{kwargs['class_letter']}"
-            finally:
-                db.close()
-        super().__init__(**kwargs)
-
 
 class Student(Base):
     """Модель ученика с достижениями."""
@@ -252,8 +468,13 @@ class Student(Base):
     id = Column(Integer, primary_key=True, index=True)
     school_class_id = Column(Integer, ForeignKey("school_classes.id"), nullable=False, index=True)
     full_name = Column(String(255), nullable=False, index=True)  # ФИО ученика
+    full_name_norm = Column(String(255), index=True)  # ФИО в нижнем регистре для индексного поиска
     achievements = Column(Text, nullable=True)  # JSON с достижениями
+    achievements_count = Column(Integer, nullable=False, default=0)  # Денормализованный счетчик достижений
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    # Время последнего изменения: сигнал для ETag экспортов и главной —
+    # правка ученика должна инвалидировать клиентские кэши
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), default=func.now(), onupdate=func.now())
 
     # Отношения
     school_class = relationship("SchoolClass", back_populates="students")
@@ -279,6 +500,8 @@ class Student(Base):
             kwargs['full_name'] = kwargs['full_name'].strip()
             if len(kwargs['full_name']) < 2:
                 raise ValueError("ФИО должно содержать минимум 2 символа")
+            # Нормализованное ФИО для поиска по индексу
+            kwargs.setdefault('full_name_norm', kwargs['full_name'].lower())
 
         super().__init__(**kwargs)
 
@@ -294,13 +517,38 @@ def search_students(
     order_by_teacher: bool = False,
     limit: int | None = None,
     offset: int | None = None,
+    columns: list | None = None,
+    eager_class: bool = False,
+    defer_achievements: bool = False,
+    stream: bool = False,
 ):
-    """Поиск учеников по ФИО, фильтр по классу/параллели и сортировка."""
+    """Поиск учеников по ФИО, фильтр по классу/параллели и сортировка.
+
+    columns — список колонок Student для load_only: страницы, которым не нужен
+    тяжелый TEXT с достижениями, не тянут его из БД и не гидратируют.
+
+    eager_class — жадная загрузка класса и его руководителя: нужна вызывающим,
+    которые читают student.class_name / student.class_teacher, иначе каждое
+    обращение к этим свойствам лениво догружает класс отдельным запросом.
+
+    defer_achievements — отложить загрузку тяжелого TEXT с достижениями,
+    оставив остальные колонки: для списочных страниц это основная часть
+    перегоняемых из БД байтов.
+
+    stream — вместо списка вернуть итератор с yield_per(500): большие
+    выборки (выгрузки целой параллели) не материализуются в памяти разом.
+    """
     stmt = select(Student).join(SchoolClass).join(Grade)
 
-    if query:
-        like = f"%{query.strip()}%"
-        stmt = stmt.where(Student.full_name.ilike(like))
+    if columns:
+        stmt = stmt.options(load_only(*columns))
+    elif defer_achievements:
+        stmt = stmt.options(defer(Student.achievements))
+
+    if eager_class:
+        stmt = stmt.options(
+            selectinload(Student.school_class).selectinload(SchoolClass.class_teacher)
+        )
 
     if class_name:
         stmt = stmt.where(SchoolClass.class_name == class_name)
@@ -323,41 +571,84 @@ def search_students(
     if offset:
         stmt = stmt.offset(offset)
 
-    return db.execute(stmt).scalars().all()
+    def run(s):
+        if stream:
+            return db.execute(s.execution_options(yield_per=500)).scalars()
+        return db.execute(s).scalars().all()
+
+    if query:
+        # Токены ФИО ищутся по префиксу через FTS5-индекс; кавычки
+        # вырезаются, чтобы не ломать синтаксис MATCH-выражения
+        tokens = [t.replace('"', '') for t in query.split()]
+        tokens = [t for t in tokens if t]
+        if tokens:
+            match = " ".join(f'"{t}"*' for t in tokens)
+            fts_clause = Student.id.in_(
+                text("SELECT rowid FROM students_fts WHERE students_fts MATCH :fts_match")
+                .bindparams(fts_match=match)
+            )
+            try:
+                return run(stmt.where(fts_clause))
+            except OperationalError:
+                # База без FTS-таблицы (init_db не запускался) — откат к LIKE
+                db.rollback()
+        stmt = stmt.where(Student.full_name.ilike(f"%{query.strip()}%"))
+
+    return run(stmt)
+
+
+# Точное совпадение ФИО и класса: форма запроса неизменна, дерево
+# select собирается один раз на модуль (как _AUTH_STMT для логина)
+_EXACT_STUDENT_STMT = (
+    select(Student)
+    .join(SchoolClass)
+    .where(
+        SchoolClass.class_name == bindparam("class_name"),
+        Student.full_name == bindparam("full_name"),
+    )
+)
 
 
 def find_similar_students(db: Session, full_name: str, class_name: str) -> list[Student]:
-    """Ищет похожих учеников для предупреждения о дублировании."""
+    """Ищет похожих учеников для предупреждения о дублировании.
+
+    Подсчет совпадающих частей ФИО выполняется на стороне SQLite
+    (сумма CASE по токенам), так что в Python не материализуется весь
+    класс и не создаются множества на каждую строку.
+    """
     # Разбиваем ФИО на части для более гибкого поиска
     name_parts = full_name.strip().split()
     if not name_parts:
         return []
 
-    # Ищем по совпадению основных частей имени и класса
-    similar_students = []
+    in_class = select(Student).join(SchoolClass).where(
+        SchoolClass.class_name == class_name.strip()
+    )
 
-    # Поиск по полному совпадению ФИО и класса
+    # Поиск по полному совпадению ФИО и класса (идет по индексу ФИО)
     exact_match = db.execute(
-        select(Student).where(
-            Student.full_name == full_name.strip(),
-            Student.class_name == class_name.strip()
-        )
+        _EXACT_STUDENT_STMT,
+        {"full_name": full_name.strip(), "class_name": class_name.strip()},
     ).scalars().all()
 
     if exact_match:
         return exact_match
 
     # Поиск по частичному совпадению (минимум 2 слова из ФИО)
-    if len(name_parts) >= 2:
-        for student in db.execute(select(Student).where(Student.class_name == class_name.strip())).scalars():
-            student_name_parts = set(student.full_name.lower().split())
-            input_name_parts = set(part.lower() for part in name_parts)
+    if len(name_parts) < 2:
+        return []
 
-            # Если совпадает минимум 2 части имени
-            if len(student_name_parts.intersection(input_name_parts)) >= 2:
-                similar_students.append(student)
+    # Балл похожести: по единице за каждый найденный токен ФИО
+    score = sum(
+        case((Student.full_name_norm.like(f"%{part.lower()}%"), 1), else_=0)
+        for part in name_parts
+    )
 
-    return similar_students[:5]  # Ограничиваем до 5 результатов
+    return db.execute(
+        in_class.where(score >= 2)
+        .order_by(score.desc(), Student.full_name.asc())
+        .limit(5)
+    ).scalars().all()
 
 
 # Функции для работы с параллелями и классами
@@ -388,12 +679,8 @@ def create_grade(db: Session, grade_number: int) -> Grade:
     return grade
 
 
-def create_school_class(db: Session, grade_id: int, class_letter: str, class_teacher_id: int | None = None) -> SchoolClass:
-    """Создать класс."""
-    grade = db.get(Grade, grade_id)
-    if not grade:
-        raise ValueError(f"Параллель с ID {grade_id} не найдена")
-
+def _build_school_class(db: Session, grade: Grade, class_letter: str, class_teacher_id: int | None = None) -> SchoolClass:
+    """Собрать объект класса без добавления в сессию и без commit."""
     class_name = f"{grade.grade_number}{class_letter}"
 
     # Проверяем уникальность
@@ -401,12 +688,21 @@ def create_school_class(db: Session, grade_id: int, class_letter: str, class_tea
     if existing:
         raise ValueError(f"Класс {class_name} уже существует")
 
-    school_class = SchoolClass(
-        grade_id=grade_id,
+    return SchoolClass(
+        grade_id=grade.id,
         class_letter=class_letter,
         class_name=class_name,
         class_teacher_id=class_teacher_id
     )
+
+
+def create_school_class(db: Session, grade_id: int, class_letter: str, class_teacher_id: int | None = None) -> SchoolClass:
+    """Создать класс."""
+    grade = db.get(Grade, grade_id)
+    if not grade:
+        raise ValueError(f"Параллель с ID {grade_id} не найдена")
+
+    school_class = _build_school_class(db, grade, class_letter, class_teacher_id)
     db.add(school_class)
     db.commit()
     db.refresh(school_class)
@@ -425,6 +721,12 @@ def update_school_class(db: Session, class_id: int, class_teacher_id: int | None
     return school_class
 
 
+# Имя файла бэкапа: одна проверка регулярным выражением вместо пары
+# startswith/endswith, заодно отсекает мусорные файлы с теми же
+# аффиксами и отдает метку времени захваченной группой
+_BACKUP_RE = re.compile(r"app_backup_(\d{8}_\d{6})\.db")
+
+
 def create_database_backup(backup_dir: str = "backups") -> str:
     """Создает бэкап базы данных."""
     # Создаем директорию для бэкапов, если не существует
@@ -440,8 +742,20 @@ def create_database_backup(backup_dir: str = "backups") -> str:
     backup_filename = f"app_backup_{timestamp}.db"
     backup_path = os.path.join(backup_dir, backup_filename)
 
-    # Копируем файл базы данных
-    shutil.copy2(db_path, backup_path)
+    # Штатный backup API SQLite вместо копирования файла: снимок
+    # консистентен даже при живых писателях, а копия app.db при
+    # активном WAL потеряла бы незачекпоинченный хвост журнала
+    src = sqlite3.connect(db_path)
+    try:
+        # Сбрасываем WAL в основной файл, чтобы бэкап не тянул журнал
+        src.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        dst = sqlite3.connect(backup_path)
+        try:
+            src.backup(dst)
+        finally:
+            dst.close()
+    finally:
+        src.close()
 
     # Очищаем старые бэкапы (оставляем последние 10)
     cleanup_old_backups(backup_dir, keep_count=10)
@@ -454,20 +768,20 @@ def cleanup_old_backups(backup_dir: str, keep_count: int = 10) -> None:
     if not os.path.exists(backup_dir):
         return
 
-    # Получаем список файлов бэкапов
-    backup_files = [
-        os.path.join(backup_dir, f)
-        for f in os.listdir(backup_dir)
-        if f.startswith("app_backup_") and f.endswith(".db")
-    ]
+    # scandir отдает записи с уже закэшированным stat — один системный
+    # вызов на файл вместо listdir + отдельного stat на каждое имя
+    with os.scandir(backup_dir) as it:
+        backup_files = [entry for entry in it if _BACKUP_RE.fullmatch(entry.name)]
 
-    # Сортируем по времени создания (новые сначала)
-    backup_files.sort(key=os.path.getctime, reverse=True)
+    # Сортируем по времени из имени файла (новые сначала): метка
+    # YYYYMMDD_HHMMSS с ведущими нулями сортируется лексикографически,
+    # без stat на каждое сравнение
+    backup_files.sort(key=lambda entry: entry.name, reverse=True)
 
     # Удаляем старые файлы
     for old_backup in backup_files[keep_count:]:
         try:
-            os.remove(old_backup)
+            os.remove(old_backup.path)
         except OSError:
             pass  # Игнорируем ошибки удаления
 
@@ -478,20 +792,23 @@ def get_backup_list(backup_dir: str = "backups") -> list[dict]:
         return []
 
     backups = []
-    for filename in os.listdir(backup_dir):
-        if filename.startswith("app_backup_") and filename.endswith(".db"):
-            filepath = os.path.join(backup_dir, filename)
-            stat = os.stat(filepath)
-            backups.append({
-                "filename": filename,
-                "filepath": filepath,
-                "size": stat.st_size,
-                "created": datetime.fromtimestamp(stat.st_ctime),
-                "size_human": f"{stat.st_size / 1024:.1f} KB"
-            })
-
-    # Сортируем по времени создания (новые сначала)
-    backups.sort(key=lambda x: x["created"], reverse=True)
+    with os.scandir(backup_dir) as it:
+        for entry in it:
+            match = _BACKUP_RE.fullmatch(entry.name)
+            if match:
+                stat = entry.stat()
+                backups.append({
+                    "filename": entry.name,
+                    "filepath": entry.path,
+                    "size": stat.st_size,
+                    # Время берем из имени файла: оно переживает
+                    # копирование/перенос, в отличие от st_ctime
+                    "created": datetime.strptime(match.group(1), "%Y%m%d_%H%M%S"),
+                    "size_human": f"{stat.st_size / 1024:.1f} KB"
+                })
+
+    # Сортируем по времени из имени файла (новые сначала)
+    backups.sort(key=lambda x: x["filename"], reverse=True)
     return backups
 
 
@@ -503,10 +820,19 @@ def restore_database_from_backup(backup_path: str) -> None:
     # Создаем бэкап текущей базы перед восстановлением
     current_backup = create_database_backup()
 
-    # Восстанавливаем из бэкапа
+    # Восстанавливаем из бэкапа. copy2 с Python 3.8 копирует через
+    # sendfile (zero-copy в ядре), отдельный буфер не нужен
     db_path = "app.db"
     shutil.copy2(backup_path, db_path)
 
+    # Убираем устаревшие сайдкары WAL: иначе SQLite может накатить
+    # старый журнал поверх только что восстановленного файла
+    for suffix in ("-wal", "-shm"):
+        try:
+            os.remove(db_path + suffix)
+        except FileNotFoundError:
+            pass
+
 
 def get_all_users(db: Session) -> list[AdminUserModel]:
     """Получает список всех пользователей."""
@@ -534,7 +860,7 @@ def create_admin_user(db: Session, username: str, password: str, role: str = "cl
     return new_user
 
 
-def update_admin_user(db: Session, user_id: int, username: str = None, password: str = None, role: str = None, is_active: str = None) -> AdminUserModel:
+def update_admin_user(db: Session, user_id: int, username: str = None, password: str = None, role: str = None, is_active: int = None) -> AdminUserModel:
     """Обновляет данные администратора."""
     user = db.get(AdminUserModel, user_id)
     if not user:
@@ -559,7 +885,7 @@ def update_admin_user(db: Session, user_id: int, username: str = None, password:
         user.role = role
 
     if is_active is not None:
-        user.is_active = is_active
+        user.is_active = int(is_active)
 
     db.commit()
     db.refresh(user)
@@ -572,13 +898,17 @@ def delete_admin_user(db: Session, user_id: int) -> None:
     if not user:
         raise ValueError(f"Пользователь с ID {user_id} не найден")
 
-    # Нельзя удалить последнего администратора
-    admin_count = db.execute(
-        select(func.count()).select_from(AdminUserModel).where(AdminUserModel.role == "admin")
-    ).scalar()
-
-    if user.role == "admin" and admin_count <= 1:
-        raise ValueError("Нельзя удалить последнего администратора")
+    # Нельзя удалить последнего администратора: ищем хотя бы одного
+    # другого админа вместо подсчета всех
+    if user.role == "admin":
+        other_admin = db.execute(
+            select(1).where(
+                AdminUserModel.role == "admin",
+                AdminUserModel.id != user_id
+            ).limit(1)
+        ).first()
+        if other_admin is None:
+            raise ValueError("Нельзя удалить последнего администратора")
 
     db.delete(user)
     db.commit()
@@ -586,7 +916,5 @@ def delete_admin_user(db: Session, user_id: int) -> None:
 
 def check_user_permission(user_role: str, permission: str) -> bool:
     """Проверяет, имеет ли пользователь указанное право."""
-    if user_role not in ROLE_PERMISSIONS:
-        return False
-    return permission in ROLE_PERMISSIONS[user_role]
+    return permission in _ROLE_PERMISSIONS_FS.get(user_role, frozenset())
 
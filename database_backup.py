@@ -1,21 +1,48 @@
 
 import bcrypt
+import os
 from dataclasses import dataclass
+from functools import lru_cache
 
 # Импортируем нужные классы из SQLAlchemy
-from sqlalchemy import Column, DateTime, Integer, String, Text, create_engine, func, select, text
+from sqlalchemy import Column, DateTime, Integer, String, Text, create_engine, event, func, select, text
 from sqlalchemy.orm import Session, declarative_base, sessionmaker
 
 
 # Создаем базовый класс для моделей
 Base = declarative_base()
 
+# Стоимость bcrypt (2^N итераций на хеширование): настраивается под
+# железо через переменную окружения, по умолчанию — библиотечные 12
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))
 
+
+@lru_cache(maxsize=4)
 def get_engine(db_url: str = "sqlite:///app.db"):
-    # Создаем подключение к SQLite. future=True для нового стиля API
+    # Создаем подключение к SQLite. future=True для нового стиля API.
+    # Движок мемоизирован: повторные вызовы переиспользуют один пул
     return create_engine(db_url, echo=False, future=True)
 
 
+@event.listens_for(get_engine(), "connect")
+def _set_sqlite_pragmas(dbapi_connection, _connection_record):
+    """Выставляет PRAGMA на каждое физическое соединение из пула.
+
+    cache_size, synchronous и temp_store действуют на уровне соединения
+    и сбрасываются для каждого нового подключения.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.executescript(
+        "PRAGMA journal_mode=WAL;"
+        "PRAGMA synchronous=NORMAL;"
+        "PRAGMA cache_size=-64000;"  # 64MB кэш страниц
+        "PRAGMA temp_store=MEMORY;"
+        "PRAGMA mmap_size=268435456;"  # 256MB mmap вместо read()
+        "PRAGMA busy_timeout=5000;"  # ждем блокировку, а не падаем сразу
+    )
+    cursor.close()
+
+
 # Фабрика сессий. Через нее будем получать доступ к БД
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
 
@@ -48,7 +75,9 @@ class AdminUserModel(Base):
 
     def set_password(self, password: str) -> None:
         """Устанавливает хешированный пароль."""
-        self.password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        self.password_hash = bcrypt.hashpw(
+            password.encode('utf-8'), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
+        ).decode('utf-8')
 
     def check_password(self, password: str) -> bool:
         """Проверяет пароль."""
@@ -71,9 +100,10 @@ def create_default_admin() -> None:
     """Создает дефолтного администратора, если его нет в базе."""
     db = SessionLocal()
     try:
-        # Проверяем, есть ли уже админы
-        admin_count = db.execute(select(func.count()).select_from(AdminUserModel)).scalar()
-        if admin_count == 0:
+        # Проверяем, есть ли уже админы (одной записи достаточно,
+        # COUNT(*) обошел бы весь индекс ради сравнения с нулем)
+        has_admins = db.execute(select(1).select_from(AdminUserModel).limit(1)).first() is not None
+        if not has_admins:
             # Создаем дефолтного админа
             default_admin = AdminUserModel(username="admin")
             default_admin.set_password("admin123")  # Временный пароль
@@ -86,6 +116,10 @@ def create_default_admin() -> None:
         db.close()
 
 
+# Фиктивный хеш для выравнивания времени логина с неизвестным именем
+_DUMMY_HASH = bcrypt.hashpw(b"dummy", bcrypt.gensalt(rounds=BCRYPT_ROUNDS))
+
+
 def authenticate_admin(username: str, password: str) -> AdminUserModel | None:
     """Аутентифицирует администратора."""
     db = SessionLocal()
@@ -97,7 +131,12 @@ def authenticate_admin(username: str, password: str) -> AdminUserModel | None:
             )
         ).scalar_one_or_none()
 
-        if admin and admin.check_password(password):
+        if admin is None:
+            # Выравниваем время ответа для несуществующего имени
+            bcrypt.checkpw(password.encode('utf-8'), _DUMMY_HASH)
+            return None
+
+        if admin.check_password(password):
             return admin
         return None
     finally:
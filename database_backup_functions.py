@@ -1,7 +1,14 @@
+import re
 import shutil
+import sqlite3
 import os
 from datetime import datetime
 
+# Имя файла бэкапа: одна проверка регулярным выражением вместо пары
+# startswith/endswith, заодно отсекает мусорные файлы с теми же
+# аффиксами и отдает метку времени захваченной группой
+_BACKUP_RE = re.compile(r"app_backup_(\d{8}_\d{6})\.db")
+
 
 def create_database_backup(backup_dir: str = "backups") -> str:
     """Создает бэкап базы данных."""
@@ -18,8 +25,19 @@ def create_database_backup(backup_dir: str = "backups") -> str:
     backup_filename = f"app_backup_{timestamp}.db"
     backup_path = os.path.join(backup_dir, backup_filename)
 
-    # Копируем файл базы данных
-    shutil.copy2(db_path, backup_path)
+    # Штатный backup API SQLite вместо копирования файла: снимок
+    # консистентен при живых писателях (копия app.db в WAL-режиме
+    # потеряла бы незачекпоинченный хвост журнала), а лок на запись
+    # держится короткими порциями по 1000 страниц
+    src = sqlite3.connect(db_path)
+    try:
+        dst = sqlite3.connect(backup_path)
+        try:
+            src.backup(dst, pages=1000)
+        finally:
+            dst.close()
+    finally:
+        src.close()
 
     # Очищаем старые бэкапы (оставляем последние 10)
     cleanup_old_backups(backup_dir, keep_count=10)
@@ -32,20 +50,20 @@ def cleanup_old_backups(backup_dir: str, keep_count: int = 10) -> None:
     if not os.path.exists(backup_dir):
         return
 
-    # Получаем список файлов бэкапов
-    backup_files = [
-        os.path.join(backup_dir, f)
-        for f in os.listdir(backup_dir)
-        if f.startswith("app_backup_") and f.endswith(".db")
-    ]
+    # scandir отдает записи с уже закэшированным stat — один системный
+    # вызов на файл вместо listdir + отдельного stat на каждое имя
+    with os.scandir(backup_dir) as it:
+        backup_files = [entry for entry in it if _BACKUP_RE.fullmatch(entry.name)]
 
-    # Сортируем по времени создания (новые сначала)
-    backup_files.sort(key=os.path.getctime, reverse=True)
+    # Сортируем по времени из имени файла (новые сначала): метка
+    # YYYYMMDD_HHMMSS с ведущими нулями сортируется лексикографически,
+    # без stat на каждое сравнение
+    backup_files.sort(key=lambda entry: entry.name, reverse=True)
 
     # Удаляем старые файлы
     for old_backup in backup_files[keep_count:]:
         try:
-            os.remove(old_backup)
+            os.remove(old_backup.path)
         except OSError:
             pass  # Игнорируем ошибки удаления
 
@@ -56,20 +74,23 @@ def get_backup_list(backup_dir: str = "backups") -> list[dict]:
         return []
 
     backups = []
-    for filename in os.listdir(backup_dir):
-        if filename.startswith("app_backup_") and filename.endswith(".db"):
-            filepath = os.path.join(backup_dir, filename)
-            stat = os.stat(filepath)
-            backups.append({
-                "filename": filename,
-                "filepath": filepath,
-                "size": stat.st_size,
-                "created": datetime.fromtimestamp(stat.st_ctime),
-                "size_human": f"{stat.st_size / 1024:.1f} KB"
-            })
-
-    # Сортируем по времени создания (новые сначала)
-    backups.sort(key=lambda x: x["created"], reverse=True)
+    with os.scandir(backup_dir) as it:
+        for entry in it:
+            match = _BACKUP_RE.fullmatch(entry.name)
+            if match:
+                stat = entry.stat()
+                backups.append({
+                    "filename": entry.name,
+                    "filepath": entry.path,
+                    "size": stat.st_size,
+                    # Время берем из имени файла: оно переживает
+                    # копирование/перенос, в отличие от st_ctime
+                    "created": datetime.strptime(match.group(1), "%Y%m%d_%H%M%S"),
+                    "size_human": f"{stat.st_size / 1024:.1f} KB"
+                })
+
+    # Сортируем по времени из имени файла (новые сначала)
+    backups.sort(key=lambda x: x["filename"], reverse=True)
     return backups
 
 
@@ -81,6 +102,15 @@ def restore_database_from_backup(backup_path: str) -> None:
     # Создаем бэкап текущей базы перед восстановлением
     current_backup = create_database_backup()
 
-    # Восстанавливаем из бэкапа
+    # Восстанавливаем из бэкапа. copy2 с Python 3.8 копирует через
+    # sendfile (zero-copy в ядре), отдельный буфер не нужен
     db_path = "app.db"
-    shutil.copy2(backup_path, db_path)
\ No newline at end of file
+    shutil.copy2(backup_path, db_path)
+
+    # Убираем устаревшие сайдкары WAL: иначе SQLite может накатить
+    # старый журнал поверх только что восстановленного файла
+    for suffix in ("-wal", "-shm"):
+        try:
+            os.remove(db_path + suffix)
+        except FileNotFoundError:
+            pass
\ No newline at end of file
@@ -0,0 +1,37 @@
+"""Конфигурация gunicorn для боевого запуска.
+
+preload_app загружает приложение до форка воркеров: движок SQLAlchemy,
+скомпилированные шаблоны и модульные константы разделяются между
+процессами через copy-on-write. Потоки в воркерах нужны, чтобы долгие
+скачивания экспортов не блокировали остальные запросы.
+"""
+
+import os
+
+bind = f"{os.environ.get('FLASK_HOST', '0.0.0.0')}:{os.environ.get('FLASK_PORT', '5001')}"
+
+workers = 2 * (os.cpu_count() or 1) + 1
+worker_class = "gthread"
+threads = 4
+preload_app = True
+
+# tmpfs для heartbeat-файлов воркеров, чтобы не будить диск
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+
+def post_fork(server, worker):
+    """Сбрасывает в воркере пул соединений, унаследованный от мастера.
+
+    С preload_app приложение (и init_db при AUTO_INIT_DB) выполняется в
+    мастере до форка, оставляя в пуле открытое соединение SQLite.
+    Переносить соединение SQLite через fork() нельзя — под WAL это
+    ломает блокировки вплоть до порчи базы. dispose(close=False)
+    отбрасывает унаследованные дескрипторы, не закрывая их за мастера;
+    воркер открывает свои собственные соединения.
+    """
+    from database import get_engine
+
+    get_engine().dispose(close=False)
+
+accesslog = "-"
+errorlog = "-"
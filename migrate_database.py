@@ -12,11 +12,21 @@ def migrate_students_table():
 
     print("Начинаем миграцию таблицы students...")
 
-    # Подключаемся к базе данных
+    # Подключаемся к базе данных. isolation_level=None отдает управление
+    # транзакциями нам: вся миграция идет одним BEGIN EXCLUSIVE вместо
+    # неявных коммитов после каждого DDL
     conn = sqlite3.connect('app.db')
+    conn.isolation_level = None
     cursor = conn.cursor()
 
     try:
+        # На время миграции отключаем FK-проверки: таблица students
+        # пересоздается, и ссылки временно неконсистентны. Журналирование
+        # не трогаем — измененные страницы пишутся в app.db уже по ходу
+        # транзакции, и только журнал отката позволяет восстановить базу
+        # после сбоя до COMMIT
+        cursor.execute("PRAGMA foreign_keys=OFF")
+        cursor.execute("BEGIN EXCLUSIVE")
         # Шаг 1: Добавляем новую колонку school_class_id
         print("Добавляем колонку school_class_id...")
         cursor.execute("""
@@ -43,24 +53,27 @@ def migrate_students_table():
             class_mapping[key] = class_id
             print(f"  {key} -> {class_id}")
 
-        # Шаг 3: Обновляем существующих учеников
+        # Шаг 3: Обновляем существующих учеников одним executemany:
+        # на десятках тысяч строк цикл execute + print на каждую запись
+        # упирался в накладные расходы подготовки запроса и stdout
         print("Обновляем данные учеников...")
 
         cursor.execute("SELECT id, class_name FROM students")
         students = cursor.fetchall()
 
+        updates = []
         for student_id, old_class_name in students:
-            if old_class_name in class_mapping:
-                new_class_id = class_mapping[old_class_name]
-                cursor.execute("""
-                    UPDATE students
-                    SET school_class_id = ?
-                    WHERE id = ?
-                """, (new_class_id, student_id))
-                print(f"  Ученик {student_id}: {old_class_name} -> class_id {new_class_id}")
+            new_class_id = class_mapping.get(old_class_name)
+            if new_class_id is not None:
+                updates.append((new_class_id, student_id))
             else:
                 print(f"  Предупреждение: Не найден класс для ученика {student_id}: {old_class_name}")
 
+        cursor.executemany(
+            "UPDATE students SET school_class_id = ? WHERE id = ?", updates
+        )
+        print(f"  Обновлено учеников: {len(updates)} из {len(students)}")
+
         # Шаг 4: Удаляем старые колонки
         print("Удаляем старые колонки...")
 
@@ -93,8 +106,13 @@ def migrate_students_table():
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_students_full_name ON students(full_name)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_students_created_at ON students(created_at DESC)")
 
-        # Сохраняем изменения
-        conn.commit()
+        # Сохраняем изменения одним коммитом
+        cursor.execute("COMMIT")
+        cursor.execute("PRAGMA foreign_keys=ON")
+
+        # Контрольная проверка целостности после пересборки таблицы
+        integrity = cursor.execute("PRAGMA integrity_check").fetchone()[0]
+        print(f"Проверка целостности: {integrity}")
 
         print("Миграция завершена успешно!")
 
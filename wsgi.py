@@ -0,0 +1,6 @@
+"""Точка входа для WSGI-сервера (gunicorn, uwsgi).
+
+Запуск: gunicorn -c gunicorn.conf.py wsgi:app
+"""
+
+from app import app  # noqa: F401